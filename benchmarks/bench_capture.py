@@ -0,0 +1,98 @@
+"""
+Latência disparo->arquivo do CameraService, sem câmera (backend fake).
+Roda N capturas pelo mesmo caminho do totem (take_photo / capture_async) e
+mostra a latência de cada uma e o custo acima do atraso simulado da câmera.
+
+Com --limite-ms o script sai com erro se a mediana do custo extra passar do
+limite (para pegar regressões no caminho de captura).
+
+Uso: python3 benchmarks/bench_capture.py [--shots 10] [--delay 0.5]
+     python3 benchmarks/bench_capture.py --backend gphoto2_shell --shots 5   (com câmera)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_fit import make_dslr_jpeg
+from camera_service import CameraService, close_backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shots", type=int, default=10)
+    parser.add_argument("--backend", default="fake", help="fake | gphoto2_shell | gphoto2")
+    parser.add_argument("--delay", type=float, default=0.5, help="atraso simulado do backend fake (s)")
+    parser.add_argument("--fonte", default="", help="JPEG que o backend fake 'captura' (padrão: 18 MP sintético)")
+    parser.add_argument("--limite-ms", type=float, default=None, help="mediana máxima do custo extra (ms)")
+    parser.add_argument("--out", default=None, help="arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.fonte
+        if args.backend == "fake" and not source:
+            source = os.path.join(tmp, "dslr.jpg")
+            make_dslr_jpeg(source)
+        config = {
+            'camera_backend': args.backend,
+            'camera_fake_source': source,
+            'camera_fake_delay': args.delay,
+            'camera_temp_folder': os.path.join(tmp, "temp"),
+        }
+        out_dir = os.path.join(tmp, "saida")
+        os.makedirs(out_dir)
+
+        # Os prints do CameraService vão para o stderr: o stdout fica só com o JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            camera = CameraService(SimpleNamespace(config=config))
+            # take_photo: disparo -> arquivo na pasta temp
+            shots = camera.measure_latency(args.shots)
+
+            # capture_async com destino: disparo -> foto já na pasta de saída
+            staged = []
+            for n in range(args.shots):
+                t = time.perf_counter()
+                path = camera.capture_async(dest_path=os.path.join(out_dir, f"foto_{n}.jpg")).result()
+                staged.append(time.perf_counter() - t if path else None)
+            close_backends()
+
+    delay = args.delay if args.backend == "fake" else 0.0
+    report = {'backend': args.backend, 'shots': args.shots, 'delay_s': delay}
+    print(f"{'caminho':24} {'n':>3} {'mín (ms)':>9} {'mediana':>9} {'máx':>9} {'extra':>9}", file=sys.stderr)
+    failed = False
+    for name, values in (("take_photo", shots), ("capture_async+destino", staged)):
+        ok = [v for v in values if v is not None]
+        if not ok:
+            print(f"{name:24} todas as capturas falharam", file=sys.stderr)
+            failed = True
+            continue
+        median = statistics.median(ok)
+        extra_ms = (median - delay) * 1000
+        report[name] = {
+            'latencies_s': [round(v, 4) if v is not None else None for v in values],
+            'failures': len(values) - len(ok),
+            'median_s': round(median, 4),
+            'extra_ms': round(extra_ms, 1),
+        }
+        print(f"{name:24} {len(ok):3} {min(ok) * 1000:9.0f} {median * 1000:9.0f} {max(ok) * 1000:9.0f} {extra_ms:9.0f}", file=sys.stderr)
+        if args.limite_ms is not None and extra_ms > args.limite_ms:
+            print(f"❌ {name}: {extra_ms:.0f} ms acima do atraso da câmera (limite {args.limite_ms:.0f} ms)", file=sys.stderr)
+            failed = True
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w') as f: f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark do núcleo de redimensionamento (image_utils) contra as chamadas
+antigas (decodificação cheia + LANCZOS direto) em uma foto sintética de 18 MP.
+
+Uso: python3 benchmarks/bench_fit.py [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageOps
+import image_utils
+
+DSLR_SIZE = (5184, 3456)  # Canon 1200D, 18 MP
+
+CASES = [
+    # (nome, tamanho, modo)
+    ("slot preview (tela)", (560, 640), "cover"),
+    ("slot card A6",        (1648, 1081), "cover"),
+    ("slot card 3 fotos",   (516, 826), "cover"),
+    ("preview operador",    (1200, 800), "contain"),
+]
+
+
+def make_dslr_jpeg(path):
+    # Ruído + gradiente: comprime como foto real (não como cor sólida)
+    base = Image.linear_gradient("L").resize(DSLR_SIZE).convert("RGB")
+    noise = Image.effect_noise(DSLR_SIZE, 40).convert("RGB")
+    Image.blend(base, noise, 0.35).save(path, quality=92)
+
+
+def old_way(path, size, mode):
+    img = Image.open(path)
+    if mode == "cover":
+        return ImageOps.fit(img, size, method=Image.Resampling.LANCZOS)
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    return img
+
+
+def new_way(path, size, mode):
+    return image_utils.load_fitted(path, size, mode)
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "dslr.jpg")
+        make_dslr_jpeg(src)
+        print(f"{'caso':24} {'antigo (ms)':>12} {'novo (ms)':>10} {'ganho':>7}")
+        for name, size, mode in CASES:
+            t_old = best_of(lambda: old_way(src, size, mode), args.repeat)
+            t_new = best_of(lambda: new_way(src, size, mode), args.repeat)
+            print(f"{name:24} {t_old:12.1f} {t_new:10.1f} {t_old / t_new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,329 @@
 import os
+import re
 import time
+import errno
 import subprocess
 import glob
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+LOG_FILE = "/opt/Totem/debug_camera.txt"
+
+# Prompt do 'gphoto2 --shell' (sem \n no fim): "gphoto2: {/pasta/local} /pasta/camera> "
+SHELL_PROMPT = re.compile(r'gphoto2: \{[^}]*\} [^>\n]*> ')
+SHELL_SAVED = re.compile(r'Saving file as (.+)$')
+
+
+class CameraBackend:
+    """Interface dos backends de captura. capture() grava a foto em filepath."""
+    name = "base"
+
+    def open(self): return True
+    def close(self): pass
+    def is_alive(self): return True
+    def capture(self, filepath, timeout=30): raise NotImplementedError
+    def preview(self, timeout=5): return None  # JPEG do liveview, se o backend tiver
+    def last_log(self): return ""
+
+
+class GPhoto2OneShotBackend(CameraBackend):
+    """Modo antigo: um processo gphoto2 por foto (lento, mas à prova de falhas)"""
+    name = "gphoto2"
+
+    def capture(self, filepath, timeout=30):
+        # Mata processos da câmera (Força bruta para garantir liberação)
+        os.system("sudo pkill -f gphoto2")
+        os.system("sudo gio mount -u gphoto2 2> /dev/null")
+        cmd = (
+            f"gphoto2 "
+            f"--auto-detect "
+            f"--capture-image-and-download "
+            f"--force-overwrite "
+            f"--filename '{filepath}' "
+            f"> {LOG_FILE} 2>&1"
+        )
+        os.system(cmd)
+        return os.path.exists(filepath) and os.path.getsize(filepath) > 0
+
+    def last_log(self):
+        try:
+            with open(LOG_FILE, 'r') as f: return f.read()
+        except: return ""
+
+
+class GPhoto2ShellBackend(CameraBackend):
+    """
+    Mantém um 'gphoto2 --shell' aberto entre fotos e sessões.
+    O handshake USB com a câmera acontece uma vez só; cada foto é apenas
+    um comando 'capture-image-and-download' enviado pelo stdin.
+    """
+    name = "gphoto2_shell"
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.proc = None
+        self.lock = threading.Lock()
+        self.log = deque(maxlen=200)
+        # Saída do shell numerada pelo prompt: o comando n roda entre o prompt n
+        # (o 1º é o de abertura) e o n+1, então cada linha tem dono certo
+        self.cond = threading.Condition()
+        self.prompts = 0
+        self.sent = 0
+        self.saved = {}
+
+    def open(self):
+        if self.is_alive(): return True
+        # Libera a câmera só na abertura da sessão (gvfs costuma prender o USB)
+        os.system("sudo pkill -f gphoto2")
+        os.system("sudo gio mount -u gphoto2 2> /dev/null")
+        try:
+            env = dict(os.environ, LANG="C", LC_ALL="C")
+            with self.cond:
+                self.prompts = self.sent = 0
+                self.saved = {}
+                self.proc = subprocess.Popen(
+                    ['gphoto2', '--shell', '--force-overwrite'],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    cwd=self.work_dir, env=env, bufsize=0
+                )
+        except Exception as e:
+            self.log.append(f"Falha ao abrir gphoto2 --shell: {e}")
+            self.proc = None
+            return False
+        threading.Thread(target=self._drain_output, args=(self.proc,), daemon=True).start()
+        self._send(f"lcd {self.work_dir}")
+        print("🔌 Sessão gphoto2 aberta")
+        return True
+
+    def _drain_output(self, proc):
+        # Consome o stdout para o pipe nunca encher e travar o gphoto2.
+        # Lê em pedaços, não por linha: o prompt não termina em \n.
+        pending = ""
+        try:
+            while True:
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk: break
+                pending += chunk.decode(errors="replace")
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    # A saída do comando seguinte vem na mesma linha do prompt
+                    self._on_line(proc, self._strip_prompts(proc, line).rstrip())
+                if SHELL_PROMPT.fullmatch(pending):
+                    pending = self._strip_prompts(proc, pending)
+        except: pass
+        finally:
+            with self.cond: self.cond.notify_all()
+
+    def _strip_prompts(self, proc, text):
+        """Conta os prompts no início do texto e devolve o resto"""
+        m = SHELL_PROMPT.match(text)
+        while m:
+            with self.cond:
+                if proc is self.proc: self.prompts += 1
+                self.cond.notify_all()
+            text = text[m.end():]
+            m = SHELL_PROMPT.match(text)
+        return text
+
+    def _on_line(self, proc, line):
+        if not line: return
+        self.log.append(line)
+        saved = SHELL_SAVED.search(line)
+        if not saved: return
+        with self.cond:
+            if proc is self.proc: self.saved[self.prompts] = saved.group(1).strip()
+            self.cond.notify_all()
+
+    def _send(self, command):
+        """Envia o comando e devolve o número dele na sessão"""
+        with self.cond:
+            self.proc.stdin.write((command + "\n").encode())
+            self.proc.stdin.flush()
+            self.sent += 1
+            return self.sent
+
+    def _run_download(self, command, timeout, close_on_timeout=True):
+        """
+        Envia um comando que baixa arquivo e espera o prompt seguinte a ele (só então
+        o "Saving file as ..." terminou). Devolve o caminho do arquivo ou None.
+        Um comando anterior que estourou o tempo sem fechar a sessão só atrasa este:
+        a saída dele fica com o número dele e não é confundida com a deste.
+        """
+        try:
+            seq = self._send(command)
+        except Exception as e:
+            self.log.append(f"Sessão gphoto2 caiu: {e}")
+            self.close()
+            return None
+
+        with self.cond:
+            done = self.cond.wait_for(lambda: not self.is_alive() or self.prompts > seq, timeout)
+            saved = self.saved.pop(seq, None)
+            for old in [n for n in self.saved if n < seq]: del self.saved[old]
+        if not done:
+            self.log.append(f"Timeout esperando '{command}'")
+            if close_on_timeout: self.close()
+            return None
+        if not self.is_alive():
+            self.close()
+            return None
+        return os.path.join(self.work_dir, saved) if saved else None
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def close(self):
+        if not self.proc: return
+        try:
+            self._send("exit")
+            self.proc.wait(timeout=3)
+        except:
+            try: self.proc.kill()
+            except: pass
+        self.proc = None
+        print("🔌 Sessão gphoto2 fechada")
+
+    def capture(self, filepath, timeout=30):
+        with self.lock:
+            if not self.open(): return False
+            src = self._run_download("capture-image-and-download", timeout)
+            if not src or not os.path.exists(src): return False
+            os.replace(src, filepath)
+            return True
+
+    def preview(self, timeout=5):
+        """
+        Quadro de liveview pela própria sessão ('capture-preview'), sem soltar o USB.
+        Não espera a captura: com a câmera ocupada devolve None e o liveview pula o quadro.
+        Um preview lento (ex.: o 1º, com o handshake) também só pula o quadro: a sessão
+        de captura nunca é fechada por causa do liveview.
+        """
+        if not self.lock.acquire(blocking=False): return None
+        try:
+            if not self.open(): return None
+            src = self._run_download("capture-preview", timeout, close_on_timeout=False)
+            if not src: return None
+            with open(src, 'rb') as f: return f.read()
+        except OSError: return None
+        finally:
+            self.lock.release()
+
+    def last_log(self):
+        return "\n".join(self.log)
+
+
+class FakeCameraBackend(CameraBackend):
+    """Backend sem câmera: grava um JPEG (copiado ou gerado) após um atraso simulado"""
+    name = "fake"
+
+    def __init__(self, source="", delay=0.5):
+        self.source = source
+        self.delay = delay
+
+    def capture(self, filepath, timeout=30):
+        time.sleep(self.delay)
+        if self.source and os.path.exists(self.source):
+            shutil.copyfile(self.source, filepath)
+        else:
+            from PIL import Image
+            Image.new("RGB", (5184, 3456), "#7f8c8d").save(filepath, quality=90)
+        return True
+
+    def last_log(self):
+        return f"Fake backend (fonte: {self.source or 'gerada'})"
+
+
+# Raízes compartilhadas com outros processos: a pasta temp nunca pode ser uma delas
+SHARED_TMP_ROOTS = {"/dev/shm", "/run/shm", "/tmp", "/var/tmp"}
+
+
+def _is_shared_root(folder):
+    folder = os.path.realpath(folder)
+    return folder in SHARED_TMP_ROOTS or os.path.ismount(folder)
+
+
+def temp_folder_for(config):
+    """
+    Pasta de staging das capturas, já criada (pode ficar num tmpfs, ex.: /dev/shm/totem).
+    Se a config apontar para a raiz de um tmpfs/montagem, usa a subpasta 'totem' dela:
+    a limpeza da pasta temp apaga tudo que houver lá dentro.
+    """
+    folder = config.get('camera_temp_folder') or "/opt/Totem/temp"
+    if _is_shared_root(folder):
+        folder = os.path.join(folder, "totem")
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder, exist_ok=True)
+            os.chmod(folder, 0o777)
+        except OSError: pass
+    return folder
+
+
+def stage_photo(src, dst):
+    """
+    Leva a foto da pasta temp para o destino final sem copiar quando possível:
+    rename no mesmo sistema de arquivos; cópia só entre dispositivos (ex.: tmpfs).
+    """
+    try:
+        os.replace(src, dst)
+        return dst
+    except OSError as e:
+        if e.errno != errno.EXDEV: raise
+    shutil.copy2(src, dst)
+    try: os.remove(src)
+    except OSError: pass
+    return dst
+
+
+# Backends ficam vivos entre instâncias de CameraService (uma por PhotoSession/teste)
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend(config, temp_folder):
+    kind = config.get('camera_backend', 'gphoto2_shell')
+    with _backends_lock:
+        backend = _backends.get(kind)
+        if backend is None:
+            if kind == 'fake':
+                backend = FakeCameraBackend(config.get('camera_fake_source', ''), float(config.get('camera_fake_delay', 0.5)))
+            elif kind == 'gphoto2':
+                backend = GPhoto2OneShotBackend()
+            else:
+                backend = GPhoto2ShellBackend(temp_folder)
+            _backends[kind] = backend
+        return backend
+
+# Um único worker: a câmera só faz uma captura por vez, na ordem em que foram pedidas
+_capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera")
+
+def close_backends():
+    with _backends_lock:
+        for backend in _backends.values():
+            try: backend.close()
+            except: pass
+        _backends.clear()
+
 
 class CameraService:
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.config = config_manager.config
-        self.temp_folder = "/opt/Totem/temp"
-        self._ensure_temp_folder()
-    
-    def _ensure_temp_folder(self):
-        if not os.path.exists(self.temp_folder):
-            try:
-                os.makedirs(self.temp_folder, exist_ok=True)
-                os.chmod(self.temp_folder, 0o777)
-            except: pass
-            
+        self.temp_folder = temp_folder_for(self.config)
+        self.backend = get_backend(self.config, self.temp_folder)
+        self.last_latency = None
+
     # --- CORREÇÃO: Função para limpar temp ---
-    def clear_temp_folder(self):
+    def clear_temp_folder(self, background=False):
         """Remove todas as fotos da pasta temp para não misturar sessões"""
+        if background:
+            # Fora da thread do Tk: o início da sessão não espera o disco
+            threading.Thread(target=self.clear_temp_folder, daemon=True).start()
+            return
+        if _is_shared_root(self.temp_folder):
+            print(f"⚠️ Pasta temp é raiz compartilhada ({self.temp_folder}); limpeza ignorada.")
+            return
         try:
             files = glob.glob(os.path.join(self.temp_folder, "*"))
             for f in files:
@@ -30,40 +334,58 @@ class CameraService:
             print(f"Erro ao limpar temp: {e}")
 
     def take_photo(self, callback=None):
-        # 1. Mata processos da câmera (Força bruta para garantir liberação)
-        os.system("sudo pkill -f gphoto2")
-        os.system("sudo gio mount -u gphoto2 2> /dev/null")
-        
-        filename = f"foto_{int(time.time())}.jpg"
+        filename = f"foto_{int(time.time() * 1000)}.jpg"
         filepath = os.path.join(self.temp_folder, filename)
-        log_file = "/opt/Totem/debug_camera.txt"
-        
-        print(f"📸 Tentando salvar em: {filepath}")
-        
-        cmd = (
-            f"gphoto2 "
-            f"--auto-detect "
-            f"--capture-image-and-download "
-            f"--force-overwrite "
-            f"--filename '{filepath}' "
-            f"> {log_file} 2>&1"
-        )
-        
-        exit_code = os.system(cmd)
-        
-        if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-            print(f"✅ SUCESSO! Foto salva em: {filepath}")
+
+        print(f"📸 Tentando salvar em: {filepath} ({self.backend.name})")
+
+        start = time.time()
+        try:
+            ok = self.backend.capture(filepath)
+        except Exception as e:
+            print(f"Erro backend câmera: {e}")
+            ok = False
+        self.last_latency = time.time() - start
+
+        if ok and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+            print(f"✅ SUCESSO! Foto salva em: {filepath} ({self.last_latency:.2f}s)")
             if callback:
                 callback(filepath)
             return True, f"✅ Foto salva!\n{filename}"
         else:
-            erro_msg = "Erro desconhecido"
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    erro_msg = f.read()
-            
+            erro_msg = self.backend.last_log() or "Erro desconhecido"
+            try:
+                with open(LOG_FILE, 'w') as f:
+                    f.write(erro_msg)
+            except: pass
+
             print(f"❌ FALHA. Log: {erro_msg}")
             return False, f"❌ Erro na câmera. Veja debug_camera.txt"
 
+    def capture_async(self, callback=None, dest_path=None):
+        """
+        Agenda uma captura e retorna na hora um Future.
+        future.result() -> caminho do arquivo, ou None se a câmera falhou.
+        Com dest_path, a foto já é movida (stage_photo) para lá na thread da câmera.
+        """
+        def job():
+            result = {}
+            ok, _ = self.take_photo(lambda fp: result.setdefault('path', fp))
+            path = result.get('path') if ok else None
+            if path and dest_path:
+                try: path = stage_photo(path, dest_path)
+                except Exception as e: print(f"Erro ao mover foto para a saída: {e}")
+            if callback: callback(path)
+            return path
+        return _capture_executor.submit(job)
+
+    def measure_latency(self, shots=3):
+        """Tira N fotos seguidas e devolve a latência disparo->arquivo de cada uma"""
+        latencies = []
+        for _ in range(shots):
+            ok, _ = self.take_photo()
+            latencies.append(self.last_latency if ok else None)
+        return latencies
+
     def _take_webcam_photo(self, c): return False, "Webcam off"
     def _get_webcam_device(self): return 0
@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from PIL import Image
+
+from template_cache import get_template_cache
+from image_utils import load_fitted, open_for_size, fit_cover
+
+# Composição do card final. Não depende de Tk: roda em processos separados
+# para a tela do totem e o painel do operador não congelarem.
+
+def load_background(bg_path, cw, ch):
+    # Vem do cache de template: decodifica/redimensiona só quando o template muda
+    card = get_template_cache(os.path.dirname(bg_path)).get((cw, ch), "resize")
+    if card is not None: return card
+    return Image.new("RGBA", (cw, ch), "#2c3e50")
+
+
+def _add_time(timings, stage, start):
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def fit_photo(path, w, h, timings=None):
+    """Decodifica a foto e recorta/redimensiona para o slot (a parte cara da composição)"""
+    if timings is None: return load_fitted(path, (w, h), "cover")
+    # Mesmo caminho do load_fitted, separando decodificação e ajuste para medir
+    t = time.perf_counter()
+    img = open_for_size(path, (w, h), "cover")
+    img.load()
+    if img.mode not in ("RGB", "RGBA", "L"): img = img.convert("RGB")
+    _add_time(timings, 'decode', t)
+    t = time.perf_counter()
+    img = fit_cover(img, (w, h))
+    _add_time(timings, 'fit', t)
+    return img
+
+
+def save_card(card, output_folder, filename=None, timings=None):
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+    fn = filename or f"card_final_{ts}.jpg"
+    fp = os.path.join(output_folder, fn)
+    t = time.perf_counter()
+    card.convert("RGB").save(fp, quality=95)
+    _add_time(timings, 'encode', t)
+    try: os.chmod(fp, 0o777)
+    except: pass
+    return fp
+
+
+def compose_card(layout_data, bg_path, slot_photos, output_folder, filename=None, timings=None):
+    """
+    Monta o card e grava o JPEG final.
+    slot_photos: lista de (indice_do_slot, caminho_da_foto). Retorna o caminho ou None.
+    timings: dict opcional que recebe os segundos de cada etapa
+    (background, decode, fit, paste, encode).
+    """
+    try:
+        cw = layout_data.get('card_width', 1800)
+        ch = layout_data.get('card_height', 1200)
+        t = time.perf_counter()
+        card = load_background(bg_path, cw, ch)
+        _add_time(timings, 'background', t)
+
+        slots = layout_data.get('slots', [])
+        for i, p in sorted(slot_photos):
+            if i >= len(slots): continue
+            try:
+                s = slots[i]
+                photo = fit_photo(p, s['w'], s['h'], timings)
+                t = time.perf_counter()
+                card.paste(photo, (s['x'], s['y']))
+                _add_time(timings, 'paste', t)
+            except: pass
+
+        return save_card(card, output_folder, filename, timings)
+    except Exception as e:
+        print(f"Erro ao compor card: {e}")
+        return None
+
+
+class CardBuilder:
+    """
+    Monta o card aos poucos, durante a sessão: o fundo é preparado no início e cada
+    foto é decodificada/encaixada (no pool de processos) assim que chega. No fim
+    só falta colar o que ainda estiver pendente e gravar o JPEG.
+    """
+    def __init__(self, layout_data, bg_path):
+        self.layout_data = dict(layout_data)
+        self.bg_path = bg_path
+        self.slots = self.layout_data.get('slots', [])
+        self.card = None
+        self.pasted = set()
+        self.photos = {}
+        self.fit_futures = {}
+        # Uma thread só mexe no buffer do card: sem disputa entre colagens
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="card")
+        self.executor.submit(self._prepare_background)
+
+    def _prepare_background(self):
+        cw = self.layout_data.get('card_width', 1800)
+        ch = self.layout_data.get('card_height', 1200)
+        self.card = load_background(self.bg_path, cw, ch)
+
+    def add_photo(self, slot_index, path):
+        if slot_index >= len(self.slots): return
+        s = self.slots[slot_index]
+        self.photos[slot_index] = path
+        try:
+            future = submit(fit_photo, path, s['w'], s['h'])
+        except Exception as e:
+            # Sem pool: _finish encaixa esta foto na própria thread do card
+            print(f"Pool de composição indisponível ({e}); foto {slot_index + 1} fica para o fim")
+            return
+        self.fit_futures[slot_index] = future
+        future.add_done_callback(lambda f: self._submit_paste(slot_index, f))
+
+    def _submit_paste(self, slot_index, future):
+        try: self.executor.submit(self._paste, slot_index, future)
+        except RuntimeError: pass  # builder já finalizado; _finish cola o que faltar
+
+    def _paste(self, slot_index, future):
+        if slot_index in self.pasted: return
+        try:
+            s = self.slots[slot_index]
+            self.card.paste(future.result(), (s['x'], s['y']))
+            self.pasted.add(slot_index)
+        except Exception as e:
+            print(f"Erro ao encaixar foto {slot_index + 1}: {e}")
+
+    def finish(self, output_folder):
+        """Retorna um Future com o caminho do card (ou None)"""
+        future = self.executor.submit(self._finish, output_folder)
+        self.executor.shutdown(wait=False)
+        return future
+
+    def cancel(self):
+        """Sessão abandonada: descarta os encaixes pendentes e encerra a thread do card"""
+        for future in self.fit_futures.values(): future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, output_folder):
+        try:
+            for slot_index, future in sorted(self.fit_futures.items()):
+                self._paste(slot_index, future)
+            # O que o pool não entregou (processo morto, pool quebrado) é feito aqui mesmo
+            for slot_index, path in sorted(self.photos.items()):
+                if slot_index in self.pasted: continue
+                s = self.slots[slot_index]
+                self.card.paste(fit_photo(path, s['w'], s['h']), (s['x'], s['y']))
+                self.pasted.add(slot_index)
+            return save_card(self.card, output_folder)
+        except Exception as e:
+            print(f"Erro ao compor card: {e}")
+            return None
+
+
+def _warm_up():
+    return os.getpid()
+
+
+_pool = None
+_pool_workers = 2
+_pool_lock = threading.Lock()
+# Composição no próprio processo quando o pool não aceita trabalho
+_fallback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="card-fallback")
+
+def get_pool(max_workers=None):
+    """
+    Pool de processos compartilhado. Usa forkserver para os filhos não herdarem
+    o estado do Tk nem locks de threads do processo principal.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            if max_workers: _pool_workers = max_workers
+            try: ctx = multiprocessing.get_context('forkserver')
+            except ValueError: ctx = multiprocessing.get_context()
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=ctx)
+        return _pool
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool: _pool = None
+    try: pool.shutdown(wait=False, cancel_futures=True)
+    except: pass
+
+def submit(fn, *args):
+    """
+    Envia ao pool compartilhado. Se um processo morreu (ex.: OOM numa foto de 18 MP)
+    o pool fica quebrado para sempre: descarta e recria uma vez antes de desistir.
+    """
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        print("⚠️ Pool de composição quebrado. Recriando...")
+        _discard_pool(pool)
+        return get_pool().submit(fn, *args)
+
+def _compose_with_fallback(layout_data, bg_path, slot_photos, output_folder):
+    try:
+        future = submit(compose_card, layout_data, bg_path, slot_photos, output_folder)
+        return future.result()
+    except BrokenProcessPool as e:
+        # Processo morreu no meio (ou o pool não sobe): compõe aqui mesmo.
+        # O próximo submit encontra o pool quebrado e o recria.
+        print(f"Pool de composição indisponível ({e}); compondo no processo principal")
+        return compose_card(layout_data, bg_path, slot_photos, output_folder)
+
+def compose_async(layout_data, bg_path, slot_photos, output_folder):
+    """compose_card no pool, caindo para este processo se o pool quebrar. Retorna o Future."""
+    return _fallback_executor.submit(_compose_with_fallback, layout_data, bg_path, slot_photos, output_folder)
+
+def warm_up_pool(max_workers=2):
+    """Sobe os processos antes do primeiro card (o primeiro submit paga a inicialização)"""
+    get_pool(max_workers)
+    for _ in range(max_workers):
+        submit(_warm_up)
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
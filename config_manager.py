@@ -8,6 +8,8 @@ import re
 from threading import Thread
 import time
 
+from paper_specs import PAPER_SPECS
+
 class ConfigManager:
     def __init__(self):
         self.base_dir = "/opt/Totem"
@@ -23,7 +25,28 @@ class ConfigManager:
             "print_borderless": False,
             "tela_totem": "principal",
             "orientacao_tela": "paisagem",
-            "resolucao_camera": "1280x720"
+            "resolucao_camera": "1280x720",
+            "camera_backend": "gphoto2_shell",
+            "camera_fake_source": "",
+            "camera_fake_delay": 0.5,
+            "camera_temp_folder": "/opt/Totem/temp",
+            "capture_hold_ms": 1000,
+            "liveview_mjpeg_file": "",
+            "liveview_fps": 25,
+            "liveview_ui_fps": 30,
+            "liveview_formato": "auto",
+            "liveview_metrics_log_s": 60,
+            "card_workers": 2,
+            "print_lp_cmd": "lp",
+            "print_lpstat_cmd": "lpstat",
+            "print_max_retries": 3,
+            "print_poll_s": 3,
+            "print_sumido_s": 120,
+            "print_imposicao": False,
+            "print_folha": "A4 (21x30cm)",
+            "print_imposicao_timeout_s": 60,
+            "chromedriver_path": "",
+            "whatsapp_timeout_confirmacao_s": 120
         }
         self.ensure_config_dir()
         self.load_config()
@@ -223,6 +246,18 @@ class ConfigWindow:
         
         toggle_lv_combo()
 
+        sec3 = self.create_section(frame, "Formato da Webcam (Liveview)")
+        f_fmt = tk.Frame(sec3, bg='#ecf0f1'); f_fmt.pack(anchor='w')
+        tk.Label(f_fmt, text="Resolução:", bg='#ecf0f1').pack(side='left')
+        self.resolucao_var = tk.StringVar(value=self.config.get('resolucao_camera', '1280x720'))
+        ttk.Combobox(f_fmt, textvariable=self.resolucao_var, values=["640x480", "1280x720", "1920x1080"], state='readonly', width=12).pack(side='left', padx=5)
+        tk.Label(f_fmt, text="FPS:", bg='#ecf0f1').pack(side='left', padx=(15, 0))
+        self.fps_var = tk.StringVar(value=str(self.config.get('liveview_fps', 25)))
+        ttk.Combobox(f_fmt, textvariable=self.fps_var, values=["15", "20", "25", "30", "60"], state='readonly', width=5).pack(side='left', padx=5)
+        tk.Label(f_fmt, text="Formato:", bg='#ecf0f1').pack(side='left', padx=(15, 0))
+        self.formato_var = tk.StringVar(value=self.config.get('liveview_formato', 'auto'))
+        ttk.Combobox(f_fmt, textvariable=self.formato_var, values=["auto", "MJPG", "YUYV"], state='readonly', width=8).pack(side='left', padx=5)
+
     def create_output_tab(self, notebook):
         frame = tk.Frame(notebook, bg='#f8f9fa', padx=20, pady=20)
         notebook.add(frame, text=" 🖨️ IMPRESSÃO ")
@@ -244,6 +279,18 @@ class ConfigWindow:
         
         self.borderless_var = tk.BooleanVar(value=self.config.get('print_borderless', False))
         tk.Checkbutton(sec2, text="Impressão Sem Bordas (Borderless)", variable=self.borderless_var, bg='#ecf0f1').pack(anchor='w')
+
+        # Imposição: junta vários cards numa folha maior, com marcas de corte
+        self.imposicao_var = tk.BooleanVar(value=self.config.get('print_imposicao', False))
+        tk.Checkbutton(sec2, text="Vários Cards por Folha (com marcas de corte)", variable=self.imposicao_var, bg='#ecf0f1').pack(anchor='w', pady=(10, 0))
+        f_folha = tk.Frame(sec2, bg='#ecf0f1')
+        f_folha.pack(anchor='w', pady=5)
+        tk.Label(f_folha, text="Folha:", bg='#ecf0f1').pack(side='left')
+        self.folha_var = tk.StringVar(value=self.config.get('print_folha', "A4 (21x30cm)"))
+        ttk.Combobox(f_folha, textvariable=self.folha_var, values=list(PAPER_SPECS.keys()), state='readonly', width=15).pack(side='left', padx=5)
+        tk.Label(f_folha, text="Esperar até (s):", bg='#ecf0f1').pack(side='left', padx=(10, 0))
+        self.imposicao_timeout_var = tk.StringVar(value=str(self.config.get('print_imposicao_timeout_s', 60)))
+        tk.Spinbox(f_folha, from_=5, to=600, increment=5, textvariable=self.imposicao_timeout_var, width=5).pack(side='left', padx=5)
         
         self.toggle_impressora()
 
@@ -319,9 +366,15 @@ class ConfigWindow:
             'camera_principal': self.camera_var.get(),
             'liveview_fonte': self.liveview_var.get(),
             'camera_liveview': self.lv_cam_var.get(),
+            'resolucao_camera': self.resolucao_var.get(),
+            'liveview_fps': int(self.fps_var.get() or 25),
+            'liveview_formato': self.formato_var.get(),
             'pasta_saida': self.pasta_var.get(),
             'usar_impressora': self.impressora_var.get(),
             'print_borderless': self.borderless_var.get(),
+            'print_imposicao': self.imposicao_var.get(),
+            'print_folha': self.folha_var.get(),
+            'print_imposicao_timeout_s': int(self.imposicao_timeout_var.get() or 60),
             'impressora_selecionada': self.impressora_combo.get(),
             'tela_totem': self.tela_var.get().replace("🖥️ ", "").split(" (")[0],
             'orientacao_tela': self.orientacao_var.get()
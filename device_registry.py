@@ -0,0 +1,189 @@
+import os
+import re
+import glob
+import json
+import ctypes
+import threading
+import subprocess
+
+SYSFS_V4L = "/sys/class/video4linux"
+
+
+class DevWatcher:
+    """
+    Avisa quando um /dev/video* aparece ou some (hotplug).
+    Usa inotify em /dev (sem thread: leitura não bloqueante); se não der, compara o mtime de /dev.
+    """
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self, path="/dev"):
+        self.path = path
+        self.fd = -1
+        self.last_mtime = self._mtime()
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK)
+            if fd >= 0 and libc.inotify_add_watch(fd, path.encode(), self.IN_CREATE | self.IN_DELETE) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        except: pass
+
+    def _mtime(self):
+        try: return os.stat(self.path).st_mtime_ns
+        except OSError: return 0
+
+    def changed(self):
+        if self.fd < 0:
+            mtime = self._mtime()
+            changed = mtime != self.last_mtime
+            self.last_mtime = mtime
+            return changed
+
+        changed = False
+        while True:
+            try: data = os.read(self.fd, 4096)
+            except BlockingIOError: break
+            except OSError: break
+            if not data: break
+            # struct inotify_event { int wd; uint32 mask, cookie, len; char name[len]; }
+            pos = 0
+            while pos + 16 <= len(data):
+                name_len = int.from_bytes(data[pos+12:pos+16], 'little')
+                name = data[pos+16:pos+16+name_len].rstrip(b'\0')
+                if name.startswith(b'video'): changed = True
+                pos += 16 + name_len
+        return changed
+
+
+def parse_v4l2_formats(text):
+    """Converte a saída de 'v4l2-ctl --list-formats-ext' em [(fourcc, w, h, fps), ...]"""
+    modes = []
+    fourcc = None; size = None
+    for line in text.splitlines():
+        m = re.search(r"\[\d+\]:\s*'(\w{4})'", line)
+        if m: fourcc = m.group(1); size = None; continue
+        m = re.search(r"Size:\s*\w+\s+(\d+)x(\d+)", line)
+        if m: size = (int(m.group(1)), int(m.group(2))); continue
+        m = re.search(r"\(([\d.]+)\s*fps\)", line)
+        if m and fourcc and size:
+            modes.append((fourcc, size[0], size[1], float(m.group(1))))
+    return modes
+
+
+class WebcamRegistry:
+    """
+    Lembra qual /dev/videoN funcionou da última vez, identificado pelo caminho estável do
+    dispositivo no sysfs (porta USB + nome), e só varre os dispositivos de novo em hotplug.
+    """
+    def __init__(self, cache_file="/opt/Totem/config/webcams.json"):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.watcher = DevWatcher()
+        self.devices = {}     # index -> identidade (atualizado só em hotplug)
+        self.last_good = {}   # índice configurado -> identidade que abriu com sucesso
+        self.modes = {}       # identidade -> modos suportados [(fourcc, w, h, fps), ...]
+        self._load()
+        self.refresh()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            self.last_good = data.get('last_good', {})
+            self.modes = {k: [tuple(m) for m in v] for k, v in data.get('modes', {}).items()}
+        except:
+            self.last_good = {}; self.modes = {}
+
+    def _save(self):
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({'last_good': self.last_good, 'modes': self.modes}, f, indent=4)
+        except Exception as e:
+            print(f"Erro ao salvar cache de webcams: {e}")
+
+    @staticmethod
+    def identity(index):
+        """Identidade estável de /dev/videoN, ou None se o nó não existir"""
+        node = os.path.join(SYSFS_V4L, f"video{index}")
+        if not os.path.exists(node): return None
+        dev = os.path.realpath(os.path.join(node, "device"))
+        name = ""
+        try:
+            with open(os.path.join(node, "name")) as f: name = f.read().strip()
+        except: pass
+        return f"{dev}|{name}"
+
+    @staticmethod
+    def _is_capture_node(index):
+        # UVC cria dois nós por câmera; o de metadados tem index != 0 e nunca entrega imagem
+        try:
+            with open(os.path.join(SYSFS_V4L, f"video{index}", "index")) as f:
+                return f.read().strip() == "0"
+        except: return True
+
+    def refresh(self):
+        with self.lock:
+            devices = {}
+            for path in glob.glob(os.path.join(SYSFS_V4L, "video*")):
+                try: index = int(os.path.basename(path)[5:])
+                except ValueError: continue
+                if not self._is_capture_node(index): continue
+                ident = self.identity(index)
+                if ident: devices[index] = ident
+            self.devices = devices
+
+    def candidates(self, target_device):
+        """Ordem de tentativa: último que funcionou para esse alvo, o alvo, depois os demais"""
+        if self.watcher.changed():
+            print("🔌 Hotplug de vídeo detectado, atualizando lista de webcams")
+            self.refresh()
+        with self.lock:
+            order = []
+            good = self.last_good.get(str(target_device))
+            if good:
+                order.extend(i for i, ident in self.devices.items() if ident == good)
+            if target_device not in order and (target_device in self.devices or not self.devices):
+                order.append(target_device)
+            order.extend(sorted(i for i in self.devices if i not in order))
+            return order
+
+    def record_success(self, target_device, index):
+        ident = self.identity(index)
+        if not ident: return
+        with self.lock:
+            if self.last_good.get(str(target_device)) == ident: return
+            self.last_good[str(target_device)] = ident
+        self._save()
+
+
+    def get_modes(self, index):
+        """Modos de captura do dispositivo. Consulta o v4l2-ctl só na primeira vez por dispositivo."""
+        ident = self.identity(index)
+        with self.lock:
+            if ident and ident in self.modes: return self.modes[ident]
+        try:
+            out = subprocess.run(['v4l2-ctl', '-d', f'/dev/video{index}', '--list-formats-ext'],
+                                 capture_output=True, text=True, timeout=3).stdout
+            modes = parse_v4l2_formats(out)
+        except Exception as e:
+            print(f"⚠️ Não foi possível listar formatos de /dev/video{index}: {e}")
+            return []
+        if ident and modes:
+            with self.lock: self.modes[ident] = modes
+            self._save()
+        return modes
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Registro único compartilhado entre os LiveviewService"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = WebcamRegistry()
+        return _registry
@@ -0,0 +1,168 @@
+import tkinter as tk
+from tkinter import messagebox
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ImageTk
+
+from thumbnail_cache import get_thumbnail_cache
+from session_index import get_session_index
+
+COLS = 4
+ROWS = 3
+PAGE_SIZE = COLS * ROWS
+
+# Miniaturas são geradas fora do Tk; a thread do Tk só cria o PhotoImage
+_thumb_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbs")
+
+
+class GalleryWindow:
+    """
+    Galeria de cards anteriores para reimpressão/reenvio.
+    Pagina pelo índice de sessões (os card_final_*.jpg anteriores a ele são
+    importados na primeira abertura) e carrega as miniaturas sob demanda.
+    """
+    def __init__(self, parent, config_manager, print_service, on_select=None):
+        self.parent = parent
+        self.config_manager = config_manager
+        self.print_service = print_service
+        self.on_select = on_select
+        self.thumbs = get_thumbnail_cache()
+        self.index = get_session_index()
+        self.page = 0
+        self.generation = 0
+        self.entries = []
+        self.tk_images = {}
+        self.selected = None
+        try: self.index.backfill_folder(self.config_manager.config.get('pasta_saida', ''))
+        except Exception as e: print(f"Erro ao importar cards antigos: {e}")
+        self.create_window()
+        self.show_page(0)
+
+    def create_window(self):
+        self.window = tk.Toplevel(self.parent)
+        self.window.title("🖼️ Galeria - Totem de Fotos")
+        self.window.attributes('-fullscreen', True)
+        self.window.configure(bg='#1a1a1a')
+        self.window.transient(self.parent)
+        self.window.grab_set()
+        self.window.bind('<Escape>', lambda e: self.close())
+        self.window.bind('<Left>', lambda e: self.show_page(self.page - 1))
+        self.window.bind('<Right>', lambda e: self.show_page(self.page + 1))
+
+        header = tk.Frame(self.window, bg='#2c3e50', height=80)
+        header.pack(fill='x')
+        header.pack_propagate(False)
+        tk.Label(header, text="🖼️ GALERIA DE CARDS", font=('Arial', 24, 'bold'), fg='white', bg='#2c3e50').pack(side='left', padx=20)
+        tk.Button(header, text="FECHAR (Esc)", font=('Arial', 12, 'bold'), bg='#c0392b', fg='white', command=self.close).pack(side='right', padx=20)
+
+        self.grid_frame = tk.Frame(self.window, bg='#1a1a1a')
+        self.grid_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        self.tiles = []
+        for n in range(PAGE_SIZE):
+            tile = tk.Frame(self.grid_frame, bg='#2c3e50', highlightthickness=3, highlightbackground='#2c3e50')
+            tile.grid(row=n // COLS, column=n % COLS, padx=8, pady=8, sticky='nsew')
+            img = tk.Label(tile, text="", bg='black', fg='gray', font=('Arial', 12))
+            img.pack(fill='both', expand=True)
+            info = tk.Label(tile, text="", bg='#2c3e50', fg='white', font=('Arial', 10))
+            info.pack(fill='x')
+            for w in (tile, img, info):
+                w.bind('<Button-1>', lambda e, i=n: self.select(i))
+            self.tiles.append((tile, img, info))
+        for c in range(COLS): self.grid_frame.columnconfigure(c, weight=1)
+        for r in range(ROWS): self.grid_frame.rowconfigure(r, weight=1)
+
+        footer = tk.Frame(self.window, bg='#1a1a1a')
+        footer.pack(fill='x', padx=20, pady=(0, 20))
+        tk.Button(footer, text="◀ ANTERIOR", font=('Arial', 14, 'bold'), bg='#7f8c8d', fg='white',
+                  command=lambda: self.show_page(self.page - 1)).pack(side='left')
+        self.lbl_page = tk.Label(footer, text="", font=('Arial', 14), fg='white', bg='#1a1a1a')
+        self.lbl_page.pack(side='left', padx=20)
+        tk.Button(footer, text="PRÓXIMA ▶", font=('Arial', 14, 'bold'), bg='#7f8c8d', fg='white',
+                  command=lambda: self.show_page(self.page + 1)).pack(side='left')
+        tk.Button(footer, text="📂 ABRIR NO PAINEL", font=('Arial', 14, 'bold'), bg='#3498db', fg='white',
+                  command=self.open_selected).pack(side='right', padx=5)
+        tk.Button(footer, text="🖨️ REIMPRIMIR", font=('Arial', 14, 'bold'), bg='#e67e22', fg='white',
+                  command=self.reprint_selected).pack(side='right', padx=5)
+
+    # --- Dados ---
+    def _load_page(self, page):
+        """Sessões da página, mais novas primeiro"""
+        return self.index.recent(PAGE_SIZE, page * PAGE_SIZE)
+
+    def show_page(self, page):
+        if page < 0: return
+        entries = self._load_page(page)
+        if not entries and page > 0: return
+        self.page = page
+        self.entries = entries
+        self.selected = None
+        # Miniaturas de uma página anterior que chegarem depois são descartadas
+        self.generation += 1
+        self.tk_images = {}
+        self.lbl_page.config(text=f"Página {page + 1}")
+
+        for n, (tile, img, info) in enumerate(self.tiles):
+            tile.config(highlightbackground='#2c3e50')
+            img.config(image='', text="")
+            if n >= len(entries):
+                info.config(text="")
+                continue
+            e = entries[n]
+            when = datetime.fromtimestamp(e['created']).strftime('%d/%m %H:%M:%S')
+            status = " ".join(s for s in (
+                f"🖨️{e['print_status']}" if e.get('print_status') else "",
+                f"📱{e['send_status']}" if e.get('send_status') else ""
+            ) if s)
+            info.config(text=f"{when} {status}")
+            img.config(text="⏳")
+            self._request_thumb(n, e['card_path'])
+
+        # Adianta as miniaturas da próxima página no cache em disco
+        for e in self._load_page(page + 1):
+            _thumb_executor.submit(self.thumbs.get, e['card_path'])
+
+    def _request_thumb(self, n, path):
+        generation = self.generation
+        future = _thumb_executor.submit(self.thumbs.load, path)
+        def done(f):
+            try: self.window.after(0, lambda: self._show_thumb(generation, n, f))
+            except: pass  # janela já fechada
+        future.add_done_callback(done)
+
+    def _show_thumb(self, generation, n, future):
+        if generation != self.generation or not self.window.winfo_exists(): return
+        _, img, _ = self.tiles[n]
+        try:
+            tk_img = ImageTk.PhotoImage(future.result())
+        except Exception as e:
+            print(f"Erro miniatura: {e}")
+            img.config(text="❌")
+            return
+        self.tk_images[n] = tk_img
+        img.config(image=tk_img, text="")
+
+    # --- Ações ---
+    def select(self, n):
+        if n >= len(self.entries): return
+        for i, (tile, _, _) in enumerate(self.tiles):
+            tile.config(highlightbackground='#f1c40f' if i == n else '#2c3e50')
+        self.selected = self.entries[n]
+
+    def reprint_selected(self):
+        if not self.selected: return
+        printer = self.config_manager.config.get('impressora_selecionada')
+        if not printer:
+            messagebox.showerror("Erro", "Nenhuma impressora configurada!", parent=self.window)
+            return
+        self.print_service.submit(self.selected['card_path'], 1)
+        messagebox.showinfo("Impressão", "✅ Card enviado para a fila", parent=self.window)
+
+    def open_selected(self):
+        """Torna o card escolhido a sessão atual do painel (imprimir/enviar pelos botões de sempre)"""
+        if not self.selected: return
+        if self.on_select: self.on_select(self.selected)
+        self.close()
+
+    def close(self):
+        self.generation += 1
+        self.window.destroy()
@@ -0,0 +1,132 @@
+import io
+import math
+import struct
+from PIL import Image
+
+# Núcleo único de redimensionamento do totem.
+# Caminho rápido: decodificação JPEG reduzida (draft) -> Image.reduce por fator
+# inteiro -> passada final LANCZOS só nos últimos 2x. Qualidade visual igual ao
+# LANCZOS direto, com uma fração do custo em fotos de 18 MP.
+
+LANCZOS = Image.Resampling.LANCZOS
+
+
+def _cover_request(src_size, size):
+    """Menor tamanho, na proporção da origem, que ainda cobre 'size' por inteiro"""
+    ow, oh = src_size
+    ratio = max(size[0] / ow, size[1] / oh)
+    return math.ceil(ow * ratio), math.ceil(oh * ratio)
+
+
+def _contain_size(src_size, size, allow_upscale=False):
+    ow, oh = src_size
+    ratio = min(size[0] / ow, size[1] / oh)
+    if not allow_upscale: ratio = min(ratio, 1.0)
+    return max(1, round(ow * ratio)), max(1, round(oh * ratio))
+
+
+def fast_resize(img, size, method=LANCZOS, box=None):
+    """
+    Redimensiona (opcionalmente só a região 'box'). Reduz por fator inteiro antes
+    da passada final, deixando sempre pelo menos 2x para o filtro trabalhar.
+    """
+    size = (int(size[0]), int(size[1]))
+    if box is None: box = (0, 0, img.size[0], img.size[1])
+    bw, bh = box[2] - box[0], box[3] - box[1]
+    factor = int(min(bw / size[0], bh / size[1]) / 2)
+    if factor >= 2 and img.mode in ("RGB", "RGBA", "L"):
+        img = img.reduce(factor, box=tuple(int(v) for v in box))
+        box = None
+    if box is None and img.size == size:
+        return img
+    return img.resize(size, method, box=box)
+
+
+def fit_cover(img, size, method=LANCZOS):
+    """Preenche 'size' recortando o excesso no centro (mesmo resultado do ImageOps.fit)"""
+    ow, oh = img.size
+    target_ratio = size[0] / size[1]
+    if ow / oh > target_ratio:
+        cw = oh * target_ratio
+        box = ((ow - cw) / 2, 0, (ow + cw) / 2, oh)
+    else:
+        ch = ow / target_ratio
+        box = (0, (oh - ch) / 2, ow, (oh + ch) / 2)
+    # reduce() só aceita caixa inteira
+    box = tuple(int(round(v)) for v in box)
+    return fast_resize(img, size, method, box=box)
+
+
+def fit_contain(img, size, method=LANCZOS, allow_upscale=False):
+    """Cabe inteira dentro de 'size', mantendo a proporção (como thumbnail)"""
+    return fast_resize(img, _contain_size(img.size, size, allow_upscale), method)
+
+
+def open_for_size(path, size, mode="cover"):
+    """
+    Abre a imagem pedindo ao decodificador JPEG só a resolução necessária
+    para o ajuste 'cover'/'contain' em 'size' (nunca menor que isso).
+    """
+    img = Image.open(path)
+    if img.format == 'JPEG':
+        if mode == "cover":
+            need = _cover_request(img.size, size)
+        else:
+            need = _contain_size(img.size, size)
+        img.draft('RGB', need)
+    return img
+
+
+def load_fitted(path, size, mode="cover", method=LANCZOS):
+    """Abre + ajusta em um passo, pelo caminho rápido"""
+    img = open_for_size(path, size, mode)
+    if img.mode not in ("RGB", "RGBA", "L"): img = img.convert("RGB")
+    if mode == "cover":
+        return fit_cover(img, size, method)
+    return fit_contain(img, size, method)
+
+
+def exif_thumbnail(img):
+    """
+    Miniatura JPEG embutida no EXIF (IFD1) da foto da câmera, ou None.
+    Lê direto do bloco EXIF bruto, sem decodificar a foto inteira.
+    """
+    raw = img.info.get('exif')
+    if not raw: return None
+    try:
+        tiff = raw[6:] if raw.startswith(b'Exif\x00\x00') else raw
+        endian = '<' if tiff[:2] == b'II' else '>'
+        ifd0 = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd0:ifd0+2])[0]
+        ifd1 = struct.unpack(endian + 'I', tiff[ifd0+2+count*12:ifd0+6+count*12])[0]
+        if not ifd1: return None
+
+        offset = length = None
+        count = struct.unpack(endian + 'H', tiff[ifd1:ifd1+2])[0]
+        for n in range(count):
+            entry = tiff[ifd1+2+n*12:ifd1+14+n*12]
+            tag = struct.unpack(endian + 'H', entry[:2])[0]
+            value = struct.unpack(endian + 'I', entry[8:12])[0]
+            if tag == 0x0201: offset = value
+            elif tag == 0x0202: length = value
+        if not offset or not length: return None
+
+        thumb = Image.open(io.BytesIO(tiff[offset:offset+length]))
+        thumb.load()
+        return thumb
+    except: return None
+
+
+def load_preview(path, size):
+    """
+    Imagem para o preview do slot na tela, já recortada no tamanho 'size'.
+    Usa a miniatura do EXIF se ela for grande o bastante; senão decodifica o JPEG
+    em escala reduzida (draft 1/2, 1/4, 1/8) em vez da resolução cheia.
+    """
+    img = Image.open(path)
+    need = _cover_request(img.size, size)
+
+    thumb = exif_thumbnail(img)
+    if thumb is not None and thumb.size[0] >= need[0] * 0.9 and thumb.size[1] >= need[1] * 0.9:
+        return fit_cover(thumb.convert('RGB'), size)
+    return load_fitted(path, size, "cover")
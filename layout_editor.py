@@ -4,6 +4,32 @@ from PIL import Image, ImageDraw, ImageTk, ImageEnhance, ImageOps
 import json
 import os
 
+from template_cache import get_template_cache
+from image_utils import fast_resize, open_for_size
+from paper_specs import PAPER_SPECS, paper_size
+
+
+def preset_slots(n_photos, width, height):
+    """Slots dos layouts prontos (1, 2 ou 3 fotos) para um card width x height"""
+    if n_photos == 1:
+        return [{"id":1,"x":50,"y":50,"w":width-100,"h":height-100}]
+    if n_photos == 2:
+        m=50
+        if height > width:
+            h=(height-(m*3))//2
+            return [{"id":1,"x":m,"y":m,"w":width-(m*2),"h":h},{"id":2,"x":m,"y":m+h+m,"w":width-(m*2),"h":h}]
+        w=(width-(m*3))//2
+        return [{"id":1,"x":m,"y":m,"w":w,"h":height-(m*2)},{"id":2,"x":m+w+m,"y":m,"w":w,"h":height-(m*2)}]
+    if n_photos == 3:
+        m=40
+        if height > width:
+            h=(height-(m*4))//3; w=int(width*0.7)
+            return [{"id":1,"x":m,"y":m,"w":w,"h":h},{"id":2,"x":width-w-m,"y":m+h+m,"w":w,"h":h},{"id":3,"x":m,"y":m+(h+m)*2,"w":w,"h":h}]
+        w=(width-(m*4))//3; h=int(height*0.7)
+        return [{"id":1,"x":m,"y":m,"w":w,"h":h},{"id":2,"x":m+w+m,"y":height-h-m,"w":w,"h":h},{"id":3,"x":m+(w+m)*2,"y":m,"w":w,"h":h}]
+    return []
+
+
 class LayoutEditor:
     def __init__(self, parent):
         self.parent = parent
@@ -13,11 +39,7 @@ class LayoutEditor:
         self.screen_w = self.parent.winfo_screenwidth()
         self.screen_h = self.parent.winfo_screenheight()
         
-        self.PAPER_SPECS = {
-            "A6 (10x15cm)": (1748, 1181),
-            "A5 (15x21cm)": (2480, 1748),
-            "A4 (21x30cm)": (3508, 2480)
-        }
+        self.PAPER_SPECS = PAPER_SPECS
         
         self.current_paper = "A6 (10x15cm)"
         self.paper_orientation = "Paisagem"
@@ -164,11 +186,7 @@ class LayoutEditor:
         self.reset_canvas_to_size()
 
     def reset_canvas_to_size(self):
-        w, h = self.PAPER_SPECS.get(self.current_paper, (1748, 1181))
-        if self.paper_orientation == "Retrato":
-            self.real_width = min(w, h); self.real_height = max(w, h)
-        else:
-            self.real_width = max(w, h); self.real_height = min(w, h)
+        self.real_width, self.real_height = paper_size(self.current_paper, self.paper_orientation)
         self.base_image = Image.new("RGB", (self.real_width, self.real_height), self.primary_color)
         self.draw = ImageDraw.Draw(self.base_image)
         self.slots = []
@@ -187,7 +205,7 @@ class LayoutEditor:
             for x in range(0, w, 5):
                 if x%50==0: d.line([(x,0),(x,h)], fill=self.secondary_color, width=3)
         elif self.active_texture == 'paper':
-            nz = Image.effect_noise((w,h), 40).convert("RGB")
+            nz = Image.effect_noise((w,h), 40).convert(img.mode)  # fundo pode ser RGB ou RGBA
             img = Image.blend(img, nz, 0.15)
             
         self.display_image = img
@@ -210,7 +228,7 @@ class LayoutEditor:
         self.preview_w = int(self.real_width * scale)
         self.preview_h = int(self.real_height * scale)
         
-        p = self.display_image.resize((self.preview_w, self.preview_h), Image.Resampling.LANCZOS)
+        p = fast_resize(self.display_image, (self.preview_w, self.preview_h))
         self.tk_image = ImageTk.PhotoImage(p)
         
         for c in [self.canvas_bg, self.canvas_card]:
@@ -274,29 +292,19 @@ class LayoutEditor:
     def toggle_texture(self, t): self.active_texture=None if self.active_texture==t else t; self.update_pipeline()
     def import_image(self):
         f=filedialog.askopenfilename(filetypes=[("Img", "*.jpg *.png")])
-        if f: i=Image.open(f).resize((self.real_width,self.real_height)); self.base_image=i; self.active_texture=None; self.update_pipeline()
+        if f:
+            i=open_for_size(f, (self.real_width,self.real_height))
+            # JPG fica RGB; só PNG com transparência vira RGBA
+            i=i.convert("RGBA" if "A" in i.mode or "transparency" in i.info else "RGB")
+            self.base_image=fast_resize(i, (self.real_width,self.real_height)); self.active_texture=None; self.update_pipeline()
     def reset_canvas_to_size_button(self): self.reset_canvas_to_size()
     def add_lbl(self, p, t): tk.Label(p, text=t, bg='#95a5a6', fg='white', font=('Arial', 10, 'bold')).pack(fill='x', pady=(15,2))
     def create_input(self, p, r, l, a, d, txt=False):
         tk.Label(p, text=l, bg='white').grid(row=r, column=0, sticky='e'); w=tk.Entry(p) if txt else tk.Spinbox(p, from_=1,to=60,width=5); w.insert(0,d); w.grid(row=r,column=1,sticky='w'); setattr(self,a,w)
     
-    def preset_1(self): self.slots=[{"id":1,"x":50,"y":50,"w":self.real_width-100,"h":self.real_height-100}]; self.redraw_slots()
-    def preset_2(self):
-        m=50; self.slots=[]
-        if self.real_height > self.real_width:
-            h=(self.real_height-(m*3))//2; self.slots=[{"id":1,"x":m,"y":m,"w":self.real_width-(m*2),"h":h},{"id":2,"x":m,"y":m+h+m,"w":self.real_width-(m*2),"h":h}]
-        else:
-            w=(self.real_width-(m*3))//2; self.slots=[{"id":1,"x":m,"y":m,"w":w,"h":self.real_height-(m*2)},{"id":2,"x":m+w+m,"y":m,"w":w,"h":self.real_height-(m*2)}]
-        self.redraw_slots()
-    def preset_3(self):
-        m=40; self.slots=[]
-        if self.real_height > self.real_width:
-            h=(self.real_height-(m*4))//3; w=int(self.real_width*0.7)
-            self.slots=[{"id":1,"x":m,"y":m,"w":w,"h":h},{"id":2,"x":self.real_width-w-m,"y":m+h+m,"w":w,"h":h},{"id":3,"x":m,"y":m+(h+m)*2,"w":w,"h":h}]
-        else:
-            w=(self.real_width-(m*4))//3; h=int(self.real_height*0.7)
-            self.slots=[{"id":1,"x":m,"y":m,"w":w,"h":h},{"id":2,"x":m+w+m,"y":self.real_height-h-m,"w":w,"h":h},{"id":3,"x":m+(w+m)*2,"y":m,"w":w,"h":h}]
-        self.redraw_slots()
+    def preset_1(self): self.slots=preset_slots(1, self.real_width, self.real_height); self.redraw_slots()
+    def preset_2(self): self.slots=preset_slots(2, self.real_width, self.real_height); self.redraw_slots()
+    def preset_3(self): self.slots=preset_slots(3, self.real_width, self.real_height); self.redraw_slots()
 
     def load_existing_config(self):
         try:
@@ -313,9 +321,10 @@ class LayoutEditor:
                 self.paper_orientation = d.get('paper_orientation', "Paisagem")
                 self.combo_orient.set(self.paper_orientation)
                 self.reset_canvas_to_size()
-                bg = os.path.join(self.template_dir, "background.png")
-                if os.path.exists(bg):
-                    i = Image.open(bg).resize((self.real_width,self.real_height))
+                i = get_template_cache(self.template_dir).get((self.real_width, self.real_height), "resize")
+                if i is not None:
+                    # Mantém o alfa do background.png: a prévia fica igual ao card composto
+                    # (o cache devolve RGBA; a textura 'paper' acompanha o modo do fundo)
                     self.base_image = i
                     self.update_pipeline()
         except: pass
@@ -1,9 +1,386 @@
 import cv2
+import numpy as np
 import threading
 import time
+import os
+import json
 from PIL import Image, ImageTk
 import re
 
+from camera_service import get_backend, temp_folder_for
+from device_registry import get_registry
+
+
+class MjpegFrameParser:
+    """Separa JPEGs completos (SOI ... EOI) de um fluxo MJPEG recebido em pedaços"""
+    SOI = b'\xff\xd8'
+    EOI = b'\xff\xd9'
+
+    def __init__(self, max_buffer=8 * 1024 * 1024):
+        self.buffer = bytearray()
+        self.scan_pos = 0
+        self.max_buffer = max_buffer
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        frames = []
+        while True:
+            start = self.buffer.find(self.SOI)
+            if start < 0:
+                # Guarda só o último byte (pode ser metade de um marcador)
+                del self.buffer[:-1]
+                self.scan_pos = 0
+                break
+            if start > 0:
+                del self.buffer[:start]
+                self.scan_pos = 0
+            end = self.buffer.find(self.EOI, max(self.scan_pos, 2))
+            if end < 0:
+                # Continua a busca de onde parou no próximo pedaço
+                self.scan_pos = max(len(self.buffer) - 1, 2)
+                if len(self.buffer) > self.max_buffer:
+                    self.buffer.clear(); self.scan_pos = 0
+                break
+            frames.append(bytes(self.buffer[:end + 2]))
+            del self.buffer[:end + 2]
+            self.scan_pos = 0
+        return frames
+
+
+class MjpegStreamSource:
+    """
+    Fonte de liveview a partir de um fluxo MJPEG.
+    Imita a interface do cv2.VideoCapture (isOpened/read/release) para entrar no mesmo loop.
+    """
+    def __init__(self):
+        self.parser = MjpegFrameParser()
+        self.latest = None
+        self.frame_id = 0
+        self.read_id = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def _open_stream(self): raise NotImplementedError
+    def _close_stream(self): pass
+
+    def start(self):
+        stream = self._open_stream()
+        if stream is None: return False
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, args=(stream,), daemon=True)
+        self.thread.start()
+        return True
+
+    def _reader(self, stream):
+        try:
+            while self.running:
+                chunk = self._read_chunk(stream)
+                if not chunk: break
+                frames = self.parser.feed(chunk)
+                if frames:
+                    with self.cond:
+                        # Só o quadro mais novo interessa
+                        self.latest = frames[-1]
+                        self.frame_id += 1
+                        self.cond.notify_all()
+        except Exception as e:
+            print(f"Erro fluxo MJPEG: {e}")
+        finally:
+            self.running = False
+            with self.cond: self.cond.notify_all()
+
+    def _read_chunk(self, stream):
+        return stream.read1(65536) if hasattr(stream, 'read1') else stream.read(65536)
+
+    def isOpened(self):
+        return self.running or self.latest is not None
+
+    def read(self, timeout=2.0):
+        with self.cond:
+            if self.frame_id == self.read_id:
+                self.cond.wait_for(lambda: self.frame_id != self.read_id or not self.running, timeout)
+            if self.frame_id == self.read_id:
+                return False, None
+            jpeg = self.latest
+            self.read_id = self.frame_id
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def release(self):
+        self.running = False
+        self._close_stream()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+
+class Gphoto2PreviewSource:
+    """
+    Liveview da própria DSLR pela sessão 'gphoto2 --shell' já aberta: um
+    'capture-preview' por quadro (não é fluxo MJPEG; o USB fica com a sessão de captura).
+    Durante a foto os quadros só param de chegar. Imita o cv2.VideoCapture como as demais.
+    O fps alcançado vai para o log (meta: TARGET_FPS).
+    """
+    TARGET_FPS = 20
+    REPORT_S = 10
+
+    def __init__(self, camera_backend):
+        self.camera_backend = camera_backend
+        self.latest = None
+        self.frame_id = 0
+        self.read_id = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.frames = 0
+        self.fps = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+        return True
+
+    def _reader(self):
+        window_start, window_frames = time.time(), 0
+        try:
+            while self.running:
+                jpeg = self.camera_backend.preview()
+                if not jpeg:
+                    time.sleep(0.05)
+                    continue
+                with self.cond:
+                    self.latest = jpeg
+                    self.frame_id += 1
+                    self.cond.notify_all()
+                self.frames += 1
+                window_frames += 1
+                elapsed = time.time() - window_start
+                if elapsed >= self.REPORT_S:
+                    self.fps = window_frames / elapsed
+                    alerta = "" if self.fps >= self.TARGET_FPS else f" (abaixo da meta de {self.TARGET_FPS})"
+                    print(f"📷 Preview da DSLR: {self.fps:.1f} fps{alerta}")
+                    window_start, window_frames = time.time(), 0
+        except Exception as e:
+            print(f"Erro preview da DSLR: {e}")
+        finally:
+            self.running = False
+            with self.cond: self.cond.notify_all()
+
+    def isOpened(self):
+        return self.running or self.latest is not None
+
+    def read(self, timeout=30.0):
+        # Durante a captura não há preview: espera a foto em vez de reabrir a fonte
+        with self.cond:
+            if self.frame_id == self.read_id:
+                self.cond.wait_for(lambda: self.frame_id != self.read_id or not self.running, timeout)
+            if self.frame_id == self.read_id:
+                return False, None
+            jpeg = self.latest
+            self.read_id = self.frame_id
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def release(self):
+        self.running = False
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+
+class MjpegFileSource(MjpegStreamSource):
+    """Substituto para testes: reproduz um arquivo .mjpeg gravado, em loop, no fps indicado"""
+    def __init__(self, path, fps=25):
+        super().__init__()
+        self.path = path
+        self.interval = 1.0 / max(fps, 1)
+
+    def _open_stream(self):
+        if not os.path.exists(self.path):
+            print(f"❌ Arquivo MJPEG não encontrado: {self.path}")
+            return None
+        return open(self.path, 'rb')
+
+    def _reader(self, stream):
+        try:
+            while self.running:
+                chunk = stream.read(65536)
+                if not chunk:
+                    stream.seek(0)
+                    continue
+                for jpeg in self.parser.feed(chunk):
+                    if not self.running: break
+                    with self.cond:
+                        self.latest = jpeg
+                        self.frame_id += 1
+                        self.cond.notify_all()
+                    time.sleep(self.interval)
+        finally:
+            stream.close()
+            self.running = False
+            with self.cond: self.cond.notify_all()
+
+
+class LatestFrameBuffer:
+    """
+    Buffer triplo "o mais novo ganha" entre a thread de captura e o Tk.
+    Três arrays pré-alocados: um sendo escrito, um pronto e um sendo lido.
+    Um quadro pronto que não foi lido antes do próximo é descartado (e contado).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = [None, None, None]
+        self.writing = None
+        self.ready = None
+        self.reading = None
+        self.ready_timestamp = 0
+        self.published = 0
+        self.dropped = 0
+
+    def get_write_buffer(self, shape):
+        with self.lock:
+            idx = next(i for i in range(3) if i != self.ready and i != self.reading)
+            buf = self.buffers[idx]
+            if buf is None or buf.shape != shape:
+                buf = np.empty(shape, np.uint8)
+                self.buffers[idx] = buf
+            self.writing = idx
+            return buf
+
+    def publish(self, timestamp):
+        """Retorna True se um quadro pronto (nunca exibido) foi descartado"""
+        with self.lock:
+            dropped = self.ready is not None
+            if dropped:
+                self.dropped += 1
+            self.ready = self.writing
+            self.writing = None
+            self.ready_timestamp = timestamp
+            self.published += 1
+            return dropped
+
+    def take(self):
+        """Retorna (array, timestamp) do quadro mais novo, ou (None, None). Chamar done_reading() depois."""
+        with self.lock:
+            if self.ready is None: return None, None
+            self.reading = self.ready
+            self.ready = None
+            return self.buffers[self.reading], self.ready_timestamp
+
+    def done_reading(self):
+        with self.lock:
+            self.reading = None
+
+
+class LiveviewRenderer:
+    """
+    Mantém um único PhotoImage por tamanho de destino e só troca os pixels (paste)
+    a cada quadro. Um novo PhotoImage só é criado quando o tamanho muda.
+    """
+    def __init__(self):
+        self.photo = None
+        self.size = None
+        self.last_render_ms = 0.0
+
+    def render(self, frame):
+        """Retorna (photo, criado_agora)"""
+        t0 = time.perf_counter()
+        img = Image.fromarray(frame)
+        created = False
+        if self.photo is None or img.size != self.size:
+            self.photo = ImageTk.PhotoImage(image=img)
+            self.size = img.size
+            created = True
+        else:
+            self.photo.paste(img)
+        self.last_render_ms = (time.perf_counter() - t0) * 1000
+        return self.photo, created
+
+
+class LiveviewMetrics:
+    """
+    Métricas do liveview: fps de captura e de exibição, quadros descartados,
+    idade do quadro ao ser exibido e tempo gasto em cada etapa (médias móveis).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.capture_fps = 0.0
+        self.delivered_fps = 0.0
+        self.frame_age_ms = 0.0
+        self.resize_ms = 0.0
+        self.convert_ms = 0.0
+        self.tk_ms = 0.0
+        self._window_start = time.time()
+        self._window_captured = 0
+        self._window_delivered = 0
+
+    @staticmethod
+    def _ema(old, new):
+        return new if old == 0 else old * 0.9 + new * 0.1
+
+    def record_capture(self, resize_ms, convert_ms, dropped):
+        with self.lock:
+            self.captured += 1
+            self._window_captured += 1
+            if dropped: self.dropped += 1
+            self.resize_ms = self._ema(self.resize_ms, resize_ms)
+            self.convert_ms = self._ema(self.convert_ms, convert_ms)
+            self._roll_window()
+
+    def record_delivery(self, tk_ms, frame_age_ms):
+        with self.lock:
+            self.delivered += 1
+            self._window_delivered += 1
+            self.tk_ms = self._ema(self.tk_ms, tk_ms)
+            self.frame_age_ms = self._ema(self.frame_age_ms, frame_age_ms)
+            self._roll_window()
+
+    def _roll_window(self):
+        now = time.time()
+        elapsed = now - self._window_start
+        if elapsed >= 1:
+            self.capture_fps = self._window_captured / elapsed
+            self.delivered_fps = self._window_delivered / elapsed
+            self._window_captured = 0
+            self._window_delivered = 0
+            self._window_start = now
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'capture_fps': round(self.capture_fps, 1),
+                'delivered_fps': round(self.delivered_fps, 1),
+                'captured': self.captured,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'frame_age_ms': round(self.frame_age_ms, 1),
+                'resize_ms': round(self.resize_ms, 2),
+                'convert_ms': round(self.convert_ms, 2),
+                'tk_ms': round(self.tk_ms, 2),
+            }
+
+    def summary(self):
+        m = self.snapshot()
+        return (f"Captura {m['capture_fps']} fps | Tela {m['delivered_fps']} fps | "
+                f"Descartados {m['dropped']} | Atraso {m['frame_age_ms']} ms | "
+                f"Resize {m['resize_ms']} ms, Cor {m['convert_ms']} ms, Tk {m['tk_ms']} ms")
+
+    def dump(self, log_file="/opt/Totem/logs/liveview_metrics.log"):
+        """Acrescenta uma linha JSON com o estado atual no log"""
+        try:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), **self.snapshot()}
+            with open(log_file, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+            return True
+        except Exception as e:
+            print(f"Erro ao gravar métricas do liveview: {e}")
+            return False
+
+
 class LiveviewService:
     def __init__(self, config_manager):
         self.config_manager = config_manager
@@ -11,6 +388,12 @@ class LiveviewService:
         self.running = False
         self.thread = None
         self.cap = None
+        self.frame_buffer = LatestFrameBuffer()
+        self.target_size = (640, 480)
+        self.ui_generation = 0
+        self.renderer = LiveviewRenderer()
+        self.display_size = (1280, 720)
+        self.metrics = LiveviewMetrics()
     
     def start_liveview(self, video_label, status_callback):
         if self.running:
@@ -21,22 +404,54 @@ class LiveviewService:
         # Relê a config para garantir que pegou a última alteração
         self.config = self.config_manager.config
         
-        if self.config.get('liveview_fonte') == 'camera_externa':
-            camera_config = self.config.get('camera_liveview', '')
-        else:
-            camera_config = self.config.get('camera_principal', '')
+        # Tamanho real ocupado na tela: a negociação de formato não precisa ir além disso
+        try:
+            l_w, l_h = video_label.winfo_width(), video_label.winfo_height()
+            if l_w > 10 and l_h > 10: self.display_size = (l_w, l_h)
+        except: pass
         
+        source_kind, camera_config = self._select_source()
         device_num = self._get_webcam_device(camera_config)
-        print(f"Iniciando Liveview na câmera index: {device_num} (Config: {camera_config})")
+        print(f"Iniciando Liveview ({source_kind}) na câmera index: {device_num} (Config: {camera_config})")
         
+        self.frame_buffer = LatestFrameBuffer()
         self.thread = threading.Thread(
             target=self._liveview_loop,
-            args=(device_num, video_label, status_callback),
+            args=(source_kind, device_num, video_label, status_callback),
             daemon=True
         )
         self.thread.start()
         
+        # O Tk só busca o quadro pronto mais novo, no ritmo da tela
+        self.ui_generation += 1
+        if hasattr(video_label, 'after'):
+            video_label.after(0, self._ui_tick, video_label, self.ui_generation, False)
+        
         return True, "Liveview iniciado"
+
+    def _ui_tick(self, video_label, generation, attached):
+        if not self.running or generation != self.ui_generation: return
+        try:
+            l_w = video_label.winfo_width()
+            l_h = video_label.winfo_height()
+            self.target_size = (l_w, l_h) if l_w > 10 and l_h > 10 else (640, 480)
+            
+            frame, timestamp = self.frame_buffer.take()
+            if frame is not None:
+                try:
+                    imgtk, created = self.renderer.render(frame)
+                finally:
+                    self.frame_buffer.done_reading()
+                self.metrics.record_delivery(self.renderer.last_render_ms, (time.time() - timestamp) * 1000)
+                # O widget só precisa ser reconfigurado quando o PhotoImage é outro
+                if created or not attached:
+                    video_label.imgtk = imgtk
+                    video_label.configure(image=imgtk)
+                    attached = True
+        except: pass
+        
+        refresh_ms = max(5, int(1000 / max(1, self.config.get('liveview_ui_fps', 30))))
+        video_label.after(refresh_ms, self._ui_tick, video_label, generation, attached)
     
     def stop_liveview(self):
         self.running = False
@@ -47,12 +462,37 @@ class LiveviewService:
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2)
     
-    def _liveview_loop(self, device_num, video_label, status_callback):
+    def _select_source(self):
+        """Decide de onde vem o liveview: arquivo MJPEG de teste, webcam ou a própria DSLR"""
+        if self.config.get('liveview_mjpeg_file'):
+            return 'mjpeg_file', ''
+        if self.config.get('liveview_fonte') == 'camera_externa':
+            return 'webcam', self.config.get('camera_liveview', '')
+        camera_config = self.config.get('camera_principal', '')
+        # Preview pela DSLR só com ela configurada; vazio ou /dev/videoN vai para a webcam
+        if 'DSLR' in camera_config:
+            return 'dslr', camera_config
+        return 'webcam', camera_config
+
+    def _open_capture(self, source_kind, device_num):
+        if source_kind == 'mjpeg_file':
+            src = MjpegFileSource(self.config.get('liveview_mjpeg_file'), self.config.get('liveview_fps', 25))
+            return src if src.start() else None
+        if source_kind == 'dslr':
+            src = Gphoto2PreviewSource(get_backend(self.config, temp_folder_for(self.config)))
+            if src.start():
+                ret, _ = src.read(timeout=5)
+                if ret: return src
+                src.release()
+            print("⚠️ Preview da DSLR indisponível. Tentando webcam...")
+        return self._find_working_webcam(device_num)
+
+    def _liveview_loop(self, source_kind, device_num, video_label, status_callback):
         def safe_status(msg):
              if hasattr(video_label, 'after'):
                  video_label.after(0, lambda: status_callback(msg))
         
-        self.cap = self._find_working_webcam(device_num)
+        self.cap = self._open_capture(source_kind, device_num)
         if not self.cap:
             safe_status("❌ Nenhuma webcam encontrada")
             self.running = False
@@ -60,60 +500,33 @@ class LiveviewService:
         
         safe_status("✅ Liveview ativo - Iniciando...")
         
-        frame_count = 0
-        start_time = time.time()
+        last_report = time.time()
+        report_every = float(self.config.get('liveview_metrics_log_s', 60))
         
         while self.running:
             try:
                 ret, frame = self.cap.read()
                 if ret and frame is not None:
-                    frame_count += 1
-                    
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    def update_ui_frame(f_rgb):
-                        if not self.running: return
-                        try:
-                            l_w = video_label.winfo_width()
-                            l_h = video_label.winfo_height()
-                            
-                            if l_w > 10 and l_h > 10:
-                                h, w = f_rgb.shape[:2]
-                                ratio = min(l_w/w, l_h/h)
-                                new_w, new_h = int(w * ratio), int(h * ratio)
-                                frame_resized = cv2.resize(f_rgb, (new_w, new_h))
-                            else:
-                                frame_resized = cv2.resize(f_rgb, (640, 480))
-                            
-                            img = Image.fromarray(frame_resized)
-                            imgtk = ImageTk.PhotoImage(image=img)
-                            
-                            video_label.imgtk = imgtk
-                            video_label.configure(image=imgtk)
-                        except: pass
-
-                    if hasattr(video_label, 'after'):
-                        video_label.after(0, update_ui_frame, frame_rgb)
+                    self._convert_into_buffer(frame)
                     
                     current_time = time.time()
-                    if current_time - start_time >= 1:
-                        fps = frame_count / (current_time - start_time)
-                        # safe_status(f"✅ Liveview ({fps:.1f} FPS)") # Comentado para não spammar texto
-                        frame_count = 0
-                        start_time = current_time
+                    if report_every > 0 and current_time - last_report >= report_every:
+                        print(f"🖼️ Liveview: {self.metrics.summary()}")
+                        self.metrics.dump()
+                        last_report = current_time
                         
                 else:
+                    if not self.running: break
                     safe_status("❌ Erro frame")
                     time.sleep(0.5)
                     # Tenta recuperar
                     self.cap.release()
-                    self.cap = cv2.VideoCapture(device_num)
+                    self.cap = self._open_capture(source_kind, device_num)
+                    if not self.cap: break
                     
             except Exception as e:
                 print(f"Erro liveview: {e}")
                 break
-            
-            time.sleep(0.033)
         
         if self.cap:
             self.cap.release()
@@ -122,27 +535,47 @@ class LiveviewService:
         safe_status("⏹️ Parado")
         self.running = False
     
+    def _convert_into_buffer(self, frame):
+        """Redimensiona e converte BGR->RGB na thread de captura, direto no buffer pré-alocado"""
+        l_w, l_h = self.target_size
+        h, w = frame.shape[:2]
+        ratio = min(l_w/w, l_h/h)
+        new_w, new_h = max(1, int(w * ratio)), max(1, int(h * ratio))
+        
+        # Redimensiona antes de converter: a conversão de cor roda em menos pixels
+        t0 = time.perf_counter()
+        small = cv2.resize(frame, (new_w, new_h)) if (new_w, new_h) != (w, h) else frame
+        t1 = time.perf_counter()
+        out = self.frame_buffer.get_write_buffer((new_h, new_w, 3))
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=out)
+        t2 = time.perf_counter()
+        dropped = self.frame_buffer.publish(time.time())
+        self.metrics.record_capture((t1 - t0) * 1000, (t2 - t1) * 1000, dropped)
+
     def _find_working_webcam(self, target_device):
         """
-        Tenta abrir PRIMEIRO o dispositivo alvo.
-        Só tenta outros se o alvo falhar.
+        Tenta abrir PRIMEIRO o dispositivo que funcionou da última vez para esse alvo.
+        Só tenta outros se ele falhar. A lista de dispositivos vem do registro
+        (sysfs), que só é refeito em hotplug.
         """
-        candidates = [target_device]
-        # Adiciona vizinhos como fallback (opcional, remova se quiser rigidez total)
-        candidates.extend([d for d in range(0, 10) if d != target_device])
+        registry = get_registry()
+        candidates = registry.candidates(target_device)
         
         for i in candidates:
             if i < 0: continue
             try:
                 cap = cv2.VideoCapture(i)
                 if cap.isOpened():
+                    # O formato precisa ser escolhido ANTES da primeira leitura
+                    fourcc, w, h, fps = self._choose_mode(registry.get_modes(i))
+                    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+                    cap.set(cv2.CAP_PROP_FPS, fps)
                     ret, frame = cap.read()
                     if ret and frame is not None:
-                        # Configurações ideais
-                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                        cap.set(cv2.CAP_PROP_FPS, 30)
-                        print(f"✅ Webcam aberta com sucesso: /dev/video{i}")
+                        print(f"✅ Webcam aberta com sucesso: /dev/video{i} ({fourcc} {w}x{h}@{fps:g})")
+                        registry.record_success(target_device, i)
                         
                         # Se abriu uma que NÃO é a alvo, avisa no log
                         if i != target_device:
@@ -158,9 +591,37 @@ class LiveviewService:
 
         return None
     
+    def _choose_mode(self, modes):
+        """
+        Escolhe o modo mais rápido que ainda cobre o tamanho exibido na tela
+        (limitado por resolucao_camera), respeitando a preferência MJPG/YUYV.
+        """
+        try: cfg_w, cfg_h = [int(v) for v in str(self.config.get('resolucao_camera', '1280x720')).lower().split('x')]
+        except: cfg_w, cfg_h = 1280, 720
+        target_fps = float(self.config.get('liveview_fps', 25))
+        prefer = str(self.config.get('liveview_formato', 'auto')).upper()
+        
+        if not modes:
+            return ('YUYV' if prefer == 'YUYV' else 'MJPG'), cfg_w, cfg_h, target_fps
+        
+        disp_w, disp_h = self.display_size
+        need_w, need_h = min(cfg_w, disp_w), min(cfg_h, disp_h)
+        
+        def rank(mode):
+            fourcc, w, h, fps = mode
+            # Com o ajuste "contain", basta uma das dimensões alcançar a área exibida
+            fits = w >= need_w or h >= need_h
+            fast = fps >= target_fps
+            preferred = fourcc == prefer if prefer != 'AUTO' else fourcc == 'MJPG'
+            # Entre os que cabem, o menor é o mais barato; entre os que não cabem, o maior
+            size_score = -(w * h) if fits else w * h
+            return (fits, fast, preferred, size_score, fps)
+        
+        return max(modes, key=rank)
+
     def _get_webcam_device(self, camera_config):
         if not camera_config: return 0
-        if '/dev/video' in camera_config:
-            match = re.search(r'/dev/video(\d+)', camera_config)
-            if match: return int(match.group(1))
+        # Aceita tanto '/dev/video2' quanto o texto da config '📹 Nome (video2)'
+        match = re.search(r'video(\d+)', camera_config)
+        if match: return int(match.group(1))
         return 0
@@ -1,11 +1,9 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
-from PIL import Image, ImageTk, ImageOps
+from PIL import ImageTk, ImageOps
 import os
 import sys
-import subprocess
 import threading
-import json
 import time
 import re
 
@@ -16,6 +14,12 @@ from test_manager import TestWindow
 from layout_editor import LayoutEditor
 from photo_session import PhotoSession
 from whatsapp_service import WhatsAppService 
+from camera_service import close_backends
+from image_utils import load_fitted
+from print_service import PrintService, PENDENTE, ENVIADO, CONCLUIDO, ERRO, AGRUPANDO
+from card_composer import shutdown_pool
+from session_index import get_session_index, ENVIO_OK, ENVIO_ERRO
+from gallery_window import GalleryWindow
 
 # --- Janela de Input de Telefone ---
 class PhoneInputDialog(tk.Toplevel):
@@ -110,11 +114,17 @@ class PhotoTotemApp:
         
         self.config_manager = ConfigManager()
         self.config = self.config_manager.load_config()
-        self.whatsapp_service = WhatsAppService()
+        self.whatsapp_service = WhatsAppService(self.config_manager)
+        self.whatsapp_service.start_background()
+        self.print_service = PrintService(self.config_manager)
+        self.session_index = get_session_index()
+        self.print_service.add_listener(self.session_index.record_print_jobs)
+        self.print_service.add_listener(lambda jobs: self.root.after(0, lambda: self.refresh_print_queue(jobs)))
         
         self.session_window = None 
         self.current_card_path = None
         self.current_individual_photos = [] 
+        self.current_session_id = None
         
         self.center_window()
         self.root.bind('<Escape>', self.sair)
@@ -145,6 +155,7 @@ class PhotoTotemApp:
         self.create_menu_button("🔄 RECARREGAR TELA TV", '#e67e22', self.recarregar_tela_totem)
         self.create_menu_button("CONFIGURAÇÕES", '#3498db', self.configuracoes)
         self.create_menu_button("LAYOUTS", '#9b59b6', self.layouts)
+        self.create_menu_button("🖼️ GALERIA", '#16a085', self.galeria)
         self.create_menu_button("WHATSAPP", '#27ae60', self.config_whatsapp) 
         self.create_menu_button("TESTES", '#f39c12', self.testes)
         
@@ -170,6 +181,24 @@ class PhotoTotemApp:
         
         self.btn_print = tk.Button(self.action_frame, text="IMPRIMIR (P)", font=('Arial', 16, 'bold'), bg='#e67e22', fg='white', height=2, command=self.action_imprimir)
         self.btn_print.pack(side='left', fill='x', expand=True, padx=5)
+        
+        copies_frame = tk.Frame(self.action_frame, bg='#ecf0f1')
+        copies_frame.pack(side='left', padx=5)
+        tk.Label(copies_frame, text="Cópias", font=('Arial', 10, 'bold'), bg='#ecf0f1').pack()
+        self.copies_var = tk.StringVar(value="1")
+        tk.Spinbox(copies_frame, from_=1, to=10, width=3, font=('Arial', 16), textvariable=self.copies_var).pack()
+        
+        # --- Fila de impressão ---
+        self.queue_frame = tk.Frame(self.right_frame, bg='#ecf0f1')
+        self.queue_frame.pack(fill='x', padx=20, pady=(0, 20))
+        tk.Label(self.queue_frame, text="🖨️ FILA DE IMPRESSÃO", font=('Arial', 11, 'bold'), bg='#ecf0f1', fg='#2c3e50').pack(anchor='w')
+        queue_row = tk.Frame(self.queue_frame, bg='#ecf0f1')
+        queue_row.pack(fill='x')
+        self.queue_list = tk.Listbox(queue_row, height=4, font=('Courier', 11))
+        self.queue_list.pack(side='left', fill='x', expand=True)
+        tk.Button(queue_row, text="🔁 REENVIAR", font=('Arial', 11, 'bold'), bg='#7f8c8d', fg='white', command=self.retry_print_job).pack(side='left', padx=5, fill='y')
+        self.queue_job_ids = []
+        self.refresh_print_queue(self.print_service.snapshot())
 
     def create_menu_button(self, text, color, command):
         tk.Button(self.left_frame, text=text, font=('Arial', 12, 'bold'), bg=color, fg='white', height=2, command=command).pack(fill='x', padx=20, pady=10)
@@ -180,6 +209,7 @@ class PhotoTotemApp:
         self.lbl_preview.config(image='', text="📸 TIRANDO FOTOS...", fg='#f1c40f')
         self.current_card_path = None
         self.current_individual_photos = []
+        self.current_session_id = None
         self.session_window.start_sequence()
 
     def action_enviar(self, event=None):
@@ -196,6 +226,7 @@ class PhotoTotemApp:
         files_to_send = [self.current_card_path]
         if self.current_individual_photos:
             files_to_send.extend(self.current_individual_photos)
+        session_id = self.current_session_id
         
         progress_win = ProgressWindow(self.root)
         self.root.update()
@@ -205,6 +236,9 @@ class PhotoTotemApp:
                 self.root.after(0, lambda: progress_win.update_progress(step, total, msg))
 
             success, msg = self.whatsapp_service.send_files_process(phone, files_to_send, update_status_wrapper)
+            if session_id:
+                try: self.session_index.set_send_status(session_id, ENVIO_OK if success else ENVIO_ERRO, phone)
+                except Exception as e: print(f"Erro ao gravar envio no índice: {e}")
             
             def on_finish():
                 progress_win.destroy()
@@ -231,60 +265,61 @@ class PhotoTotemApp:
         if not printer:
             messagebox.showerror("Erro", "Nenhuma impressora configurada!")
             return
-            
-        original_text = self.btn_print['text']
-        self.btn_print.config(text="🖨️ ENVIANDO...", state='disabled')
-        
-        def run_print():
-            try:
-                layout_json = "/opt/Totem/templates/config_card.json"
-                target_w, target_h = 1800, 1200 
-                media = "w288h432" 
-                borderless = self.config.get('print_borderless', False)
-                
-                if os.path.exists(layout_json):
-                    with open(layout_json) as f:
-                        d = json.load(f)
-                        target_w = d.get('card_width', 1800)
-                        target_h = d.get('card_height', 1200)
-                        sz = d.get('print_paper_size', '')
-                        if "A4" in sz: media="A4"
-                        elif "A5" in sz: media="A5"
-                        elif "A6" in sz: media="A6"
-                
-                print_file = self.current_card_path
-                temp_print = self.current_card_path.replace(".jpg", "_print_ready.jpg")
-                
-                with Image.open(print_file) as img:
-                    img_resized = img.resize((target_w, target_h), Image.Resampling.LANCZOS)
-                    img_resized.save(temp_print, quality=100)
-                    print_file = temp_print
+        
+        try: copies = max(1, int(self.copies_var.get()))
+        except ValueError: copies = 1
+        
+        # Só entra na fila: envio, acompanhamento e novas tentativas rodam em segundo plano
+        self.print_service.submit(self.current_card_path, copies)
+        self.copies_var.set("1")
+        original_text = "IMPRIMIR (P)"
+        self.btn_print.config(text="✅ NA FILA")
+        self.root.after(1500, lambda: self.btn_print.config(text=original_text))
 
-                cmd = ['lp', '-d', printer, '-o', f'media={media}', '-o', 'fit-to-page']
-                if borderless: cmd.extend(['-o', 'stpi-border=borderless'])
-                cmd.append(print_file)
-                
-                print(f"🚀 Executando Print: {cmd}")
-                subprocess.run(cmd, timeout=20)
-                self.root.after(0, lambda: messagebox.showinfo("Sucesso", "Enviado para impressora!"))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Erro", f"Falha na impressão: {e}"))
-            finally:
-                self.root.after(0, lambda: self.btn_print.config(text=original_text, state='normal'))
-        threading.Thread(target=run_print, daemon=True).start()
+    def refresh_print_queue(self, jobs):
+        icons = {PENDENTE: "⏳", ENVIADO: "🖨️", CONCLUIDO: "✅", ERRO: "❌", AGRUPANDO: "🧩"}
+        recent = jobs[-20:][::-1]
+        self.queue_list.delete(0, 'end')
+        self.queue_job_ids = []
+        for j in recent:
+            name = os.path.basename(j['file'])
+            if j.get('sheet'): name = f"{name} ({len(j.get('cards', []))} trab.)"
+            elif j.get('sheet_job'): name = f"{name} → folha #{j['sheet_job']}"
+            line = f"{icons.get(j['status'], '?')} #{j['id']:<4} {j['status']:<10} {j['copies']}x {name}"
+            if j['status'] in (PENDENTE, ERRO) and j.get('error'):
+                line += f"  ({j['error'][:40]})"
+            self.queue_list.insert('end', line)
+            self.queue_job_ids.append(j['id'])
 
-    def on_session_complete(self, card_path, individual_photos=None):
+    def retry_print_job(self):
+        sel = self.queue_list.curselection()
+        if not sel: return
+        self.print_service.retry(self.queue_job_ids[sel[0]])
+
+    def on_session_complete(self, card_path, individual_photos=None, timings=None):
         self.current_card_path = card_path
         self.current_individual_photos = individual_photos if individual_photos else []
+        try: self.current_session_id = self.session_index.add_session(card_path, self.current_individual_photos, timings)
+        except Exception as e:
+            print(f"Erro ao indexar sessão: {e}")
+            self.current_session_id = None
         self.show_preview(card_path)
+        if self.config.get('usar_impressora'):
+            self.print_service.prepare(card_path)
+
+    def on_gallery_select(self, session):
+        """Card escolhido na galeria vira a sessão atual (reimprimir/reenviar)"""
+        self.current_card_path = session['card_path']
+        self.current_individual_photos = [p for p in session.get('photos', []) if os.path.exists(p)]
+        self.current_session_id = session.get('id')
+        self.show_preview(self.current_card_path)
 
     def show_preview(self, path):
         try:
-            img = Image.open(path)
             fw = self.preview_frame.winfo_width()
             fh = self.preview_frame.winfo_height()
             if fw < 50: fw=600; fh=400
-            img.thumbnail((fw, fh), Image.Resampling.LANCZOS)
+            img = load_fitted(path, (fw, fh), "contain")
             self.tk_img = ImageTk.PhotoImage(img)
             self.lbl_preview.config(image=self.tk_img, text="")
         except Exception as e:
@@ -310,6 +345,7 @@ class PhotoTotemApp:
     def configuracoes(self): ConfigWindow(self.root)
     def testes(self): TestWindow(self.root, self.config_manager)
     def layouts(self): LayoutEditor(self.root)
+    def galeria(self): GalleryWindow(self.root, self.config_manager, self.print_service, self.on_gallery_select)
     def config_whatsapp(self): self.whatsapp_service.open_config_window(self.root)
     
     def sair(self, event=None):
@@ -317,6 +353,9 @@ class PhotoTotemApp:
             if self.session_window: 
                 try: self.session_window.destroy()
                 except: pass
+            close_backends()
+            shutdown_pool()
+            self.whatsapp_service.close()
             self.root.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+# Tamanho do papel em pixels a 300 dpi (paisagem).
+# Módulo sem Tk: usado pelo editor, pela fila de impressão e pela config.
+PAPER_SPECS = {
+    "A6 (10x15cm)": (1748, 1181),
+    "A5 (15x21cm)": (2480, 1748),
+    "A4 (21x30cm)": (3508, 2480)
+}
+
+
+def paper_size(paper, orientation="Paisagem"):
+    """Tamanho do card (largura, altura) para o papel e a orientação"""
+    w, h = PAPER_SPECS.get(paper, (1748, 1181))
+    if orientation == "Retrato": return min(w, h), max(w, h)
+    return max(w, h), min(w, h)
@@ -1,7 +1,6 @@
 import tkinter as tk
-from PIL import Image, ImageTk, ImageOps
+from PIL import ImageTk
 import time
-import threading
 import os
 import json
 import shutil
@@ -10,6 +9,9 @@ from datetime import datetime
 
 from camera_service import CameraService
 from liveview_service import LiveviewService
+from card_composer import CardBuilder, compose_async, warm_up_pool
+from template_cache import get_template_cache
+from image_utils import load_preview
 
 class PhotoSession:
     def __init__(self, parent, config_manager, on_complete_callback):
@@ -31,7 +33,16 @@ class PhotoSession:
         self.current_slot_index = 0
         self.captured_images = [] 
         self.photos_taken = []
+        self.slot_photos = {}
+        self.pending_captures = {}
+        self.session_id = 0
+        self.card_future = None
+        self.card_builder = None
+        self.template_cache = get_template_cache(self.template_dir)
+        self.bg_photo = None
+        self.bg_signature = None
         
+        warm_up_pool(int(self.config.get('card_workers', 2)))
         self.create_window()
         
     def ensure_output_folder(self):
@@ -80,18 +91,30 @@ class PhotoSession:
         self.reset_session()
 
     def reset_session(self):
-        self.camera_service.clear_temp_folder()
+        self.camera_service.clear_temp_folder(background=True)
         self.current_slot_index = 0
         self.captured_images = []
         self.photos_taken = []
+        self.slot_photos = {}
+        self.pending_captures = {}
+        self.card_future = None
+        # Builder de uma sessão interrompida: encerra a thread e os encaixes na fila
+        if self.card_builder: self.card_builder.cancel()
+        self.card_builder = None
+        self.timings = {}
+        # Capturas de uma sessão anterior que terminarem depois do reset são ignoradas
+        self.session_id += 1
         self.liveview_service.stop_liveview()
         self.canvas.delete("all")
         
         if os.path.exists(self.bg_path):
             try:
-                img = Image.open(self.bg_path)
-                img_cover = ImageOps.fit(img, (self.screen_w, self.screen_h), method=Image.Resampling.LANCZOS)
-                self.bg_photo = ImageTk.PhotoImage(img_cover)
+                # Mesmo template da sessão anterior: reaproveita a imagem já pronta para o Tk
+                sig = self.template_cache.signature()
+                if self.bg_photo is None or sig != self.bg_signature:
+                    img_cover = self.template_cache.get((self.screen_w, self.screen_h), "cover")
+                    self.bg_photo = ImageTk.PhotoImage(img_cover)
+                    self.bg_signature = sig
                 self.canvas.create_image(self.screen_w//2, self.screen_h//2, anchor="center", image=self.bg_photo, tags="background")
             except: pass
         else:
@@ -108,6 +131,9 @@ class PhotoSession:
         self.reset_session()
         slots = self.layout_data.get('slots', [])
         if not slots: return
+        self.timings = {'inicio': time.time(), 'captura_s': {}}
+        # O card começa a ser montado já na primeira contagem
+        self.card_builder = CardBuilder(self.layout_data, self.bg_path)
         self.process_next_slot()
 
     def process_next_slot(self):
@@ -155,44 +181,72 @@ class PhotoSession:
         self.update_message("📸")
         self.window.update()
         
-        def on_taken_thread_safe(filepath):
-            self.window.after(10, lambda: self.place_photo_in_layout(filepath))
-            
-        threading.Thread(target=lambda: self.camera_service.take_photo(on_taken_thread_safe), daemon=True).start()
+        # Não espera o download: a próxima contagem começa enquanto o arquivo ainda chega
+        slot_index = self.current_slot_index
+        session_id = self.session_id
+        started = time.time()
+        # A foto vai direto para a pasta de saída (rename, sem cópia) na thread da câmera
+        filename = f"foto_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{slot_index+1}.jpg"
+        future = self.camera_service.capture_async(dest_path=os.path.join(self.output_folder, filename))
+        self.pending_captures[slot_index] = future
+        
+        def on_done_thread_safe(f):
+            elapsed = time.time() - started
+            self.window.after(0, lambda: self.on_capture_done(session_id, slot_index, f, elapsed))
+        future.add_done_callback(on_done_thread_safe)
+        
+        hold_ms = int(self.config.get('capture_hold_ms', 1000))
+        self.window.after(hold_ms, self.schedule_next)
 
-    def place_photo_in_layout(self, temp_path):
-        self.update_message("")
-        if not os.path.exists(temp_path):
-            self.schedule_next()
+    def on_capture_done(self, session_id, slot_index, future, elapsed=None):
+        if session_id != self.session_id: return
+        self.pending_captures.pop(slot_index, None)
+        if elapsed is not None: self.timings.setdefault('captura_s', {})[str(slot_index + 1)] = round(elapsed, 3)
+        try: photo_path = future.result()
+        except Exception as e:
+            print(f"Erro captura: {e}")
+            photo_path = None
+        if photo_path:
+            self.place_photo_in_layout(photo_path, slot_index)
+
+    def place_photo_in_layout(self, photo_path, slot_index):
+        if not os.path.exists(photo_path):
             return
 
-        try:
-            filename = f"foto_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.current_slot_index+1}.jpg"
-            final_path = os.path.join(self.output_folder, filename)
-            shutil.copy2(temp_path, final_path)
-            display_path = final_path
-        except: display_path = temp_path
+        display_path = photo_path
+        if os.path.dirname(os.path.abspath(photo_path)) != os.path.abspath(self.output_folder):
+            # Não foi movida na captura (falha ao mover): copia como antes
+            try:
+                filename = f"foto_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{slot_index+1}.jpg"
+                final_path = os.path.join(self.output_folder, filename)
+                shutil.copy2(photo_path, final_path)
+                display_path = final_path
+            except: pass
 
-        self.photos_taken.append(display_path)
+        self.slot_photos[slot_index] = display_path
+        if self.card_builder:
+            self.card_builder.add_photo(slot_index, display_path)
         slots = self.layout_data.get('slots', [])
         
-        if self.current_slot_index < len(slots):
-            slot = slots[self.current_slot_index]
+        if slot_index < len(slots):
+            slot = slots[slot_index]
             x, y, w, h = self.get_slot_rect_screen(slot)
             try:
-                img = Image.open(display_path)
-                img_cover = ImageOps.fit(img, (w, h), method=Image.Resampling.LANCZOS)
+                # Preview da tela vem de decodificação reduzida; a resolução cheia fica para o card
+                img_cover = load_preview(display_path, (w, h))
                 tk_img = ImageTk.PhotoImage(img_cover)
                 self.captured_images.append(tk_img)
                 
-                self.canvas.delete(f"slot_num_{self.current_slot_index}")
+                self.canvas.delete(f"slot_num_{slot_index}")
                 self.canvas.create_image(x + w//2, y + h//2, anchor="center", image=tk_img, tags="photo")
                 self.canvas.create_rectangle(x, y, x+w, y+h, outline="#2ecc71", width=4, tags="border")
+                # A foto pode chegar durante a contagem seguinte: mantém o liveview e o texto por cima
+                self.canvas.tag_raise("liveview_feed")
+                self.canvas.tag_raise("overlay_text")
             except Exception as e: print(f"Erro render foto: {e}")
 
-        self.schedule_next()
-
     def schedule_next(self):
+        self.update_message("")
         self.current_slot_index += 1
         self.window.after(1000, self.process_next_slot)
 
@@ -208,42 +262,53 @@ class PhotoSession:
         self.canvas.tag_raise("overlay_text")
 
     def finish_session(self):
-        card_path = self.generate_final_card_sync()
+        # Espera os downloads que ainda estão em andamento
+        if self.pending_captures:
+            self.update_message("⏳")
+            self.window.after(100, self.finish_session)
+            return
+        self.photos_taken = [self.slot_photos[i] for i in sorted(self.slot_photos)]
         msg = self.layout_data.get('msg_end', 'FIM!')
         self.update_message(msg)
         
-        # MODIFICAÇÃO: Passa também a lista de fotos individuais (self.photos_taken)
-        if self.on_complete_callback and card_path:
-            self.window.after(500, lambda: self.on_complete_callback(card_path, self.photos_taken))
-
-    def generate_final_card_sync(self):
-        try:
-            cw = self.layout_data.get('card_width', 1800)
-            ch = self.layout_data.get('card_height', 1200)
-            
-            if os.path.exists(self.bg_path):
-                card = Image.open(self.bg_path).convert("RGBA").resize((cw, ch), Image.Resampling.LANCZOS)
-            else:
-                card = Image.new("RGBA", (cw, ch), "#2c3e50")
+        # A composição roda fora do Tk; o Tk continua livre para animar a tela.
+        # Com o card montado durante a sessão, só falta a última foto e o JPEG.
+        session_id = self.session_id
+        self.timings['fim_capturas'] = time.time()
+        if self.card_builder:
+            self.card_future = self.card_builder.finish(self.output_folder)
+            self.card_builder = None
+        else:
+            self.card_future = compose_async(
+                dict(self.layout_data), self.bg_path, sorted(self.slot_photos.items()), self.output_folder
+            )
+        self.card_future.add_done_callback(
+            lambda f: self.window.after(0, lambda: self.on_card_ready(session_id, f))
+        )
+        self.animate_waiting(0)
 
-            slots = self.layout_data.get('slots', [])
-            for i, p in enumerate(self.photos_taken):
-                if i >= len(slots): break
-                try:
-                    s = slots[i]
-                    img = Image.open(p).convert("RGBA")
-                    img_cover = ImageOps.fit(img, (s['w'], s['h']), method=Image.Resampling.LANCZOS)
-                    card.paste(img_cover, (s['x'], s['y']))
-                except: pass
+    def animate_waiting(self, step):
+        self.canvas.delete("spinner")
+        if not self.card_future or self.card_future.done(): return
+        dots = "●" * (step % 4 + 1)
+        self.canvas.create_text(self.screen_w // 2, self.screen_h // 2 + 90, text=dots, font=('Arial', 28, 'bold'),
+                                fill=self.layout_data.get('font_color', 'white'), tags="spinner")
+        self.window.after(300, lambda: self.animate_waiting(step + 1))
 
-            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-            fn = f"card_final_{ts}.jpg"
-            fp = os.path.join(self.output_folder, fn)
-            card.convert("RGB").save(fp, quality=95)
-            try: os.chmod(fp, 0o777)
-            except: pass
-            return fp
-        except: return None
+    def on_card_ready(self, session_id, future):
+        self.canvas.delete("spinner")
+        if session_id != self.session_id: return
+        try: card_path = future.result()
+        except Exception as e:
+            print(f"Erro ao gerar card: {e}")
+            card_path = None
+        if 'fim_capturas' in self.timings:
+            self.timings['card_s'] = round(time.time() - self.timings['fim_capturas'], 3)
+            self.timings['total_s'] = round(time.time() - self.timings['inicio'], 3)
+        
+        # MODIFICAÇÃO: Passa também a lista de fotos individuais (self.photos_taken)
+        if self.on_complete_callback and card_path:
+            self.window.after(500, lambda: self.on_complete_callback(card_path, self.photos_taken, dict(self.timings)))
 
     def get_slot_rect_screen(self, slot):
         x = int(slot['x'] * self.scale) + self.offset_x
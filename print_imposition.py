@@ -0,0 +1,93 @@
+import os
+from datetime import datetime
+from PIL import Image, ImageDraw
+
+from image_utils import fit_contain, open_for_size
+
+# Imposição: vários cards na mesma folha, com marcas de corte.
+
+
+def sheet_layout(card_size, sheet_size, margin=40, gutter=0, min_scale=0.93):
+    """
+    Melhor grade de cards na folha, testando card e folha nas duas orientações.
+    Os cards podem ser reduzidos até 'min_scale' para caber mais um e sobrar
+    'margin' para as marcas de corte.
+    Retorna dict com cols, rows, rotate, sheet (w, h), tile (w, h), gutter e scale.
+    """
+    best = None
+    sw0, sh0 = sheet_size
+    for sheet_w, sheet_h in ((max(sw0, sh0), min(sw0, sh0)), (min(sw0, sh0), max(sw0, sh0))):
+        for rotate in (False, True):
+            cw, ch = (card_size[1], card_size[0]) if rotate else card_size
+            usable_w, usable_h = sheet_w - 2 * margin, sheet_h - 2 * margin
+            cols = int((usable_w + gutter) // (cw * min_scale + gutter))
+            rows = int((usable_h + gutter) // (ch * min_scale + gutter))
+            if cols * rows == 0: continue
+            used_w = cols * cw + (cols - 1) * gutter
+            used_h = rows * ch + (rows - 1) * gutter
+            scale = min(1.0, usable_w / used_w, usable_h / used_h)
+            option = {
+                'cols': cols, 'rows': rows, 'rotate': rotate,
+                'sheet': (sheet_w, sheet_h),
+                'tile': (int(cw * scale), int(ch * scale)),
+                'gutter': int(gutter * scale), 'scale': scale
+            }
+            key = (cols * rows, scale)
+            if best is None or key > best[0]:
+                best = (key, option)
+    return best[1] if best else None
+
+
+def cards_per_sheet(card_size, sheet_size):
+    layout = sheet_layout(card_size, sheet_size)
+    return layout['cols'] * layout['rows'] if layout else 0
+
+
+def impose(card_paths, card_size, sheet_size, cut_marks=True):
+    """Monta a folha com os cards (na ordem, preenchendo linha a linha)"""
+    layout = sheet_layout(card_size, sheet_size)
+    if not layout: raise ValueError("O card não cabe na folha")
+
+    sheet_w, sheet_h = layout['sheet']
+    tile_w, tile_h = layout['tile']
+    cols, rows, gutter = layout['cols'], layout['rows'], layout['gutter']
+    sheet = Image.new("RGB", (sheet_w, sheet_h), "white")
+
+    grid_w = cols * tile_w + (cols - 1) * gutter
+    grid_h = rows * tile_h + (rows - 1) * gutter
+    x0 = (sheet_w - grid_w) // 2
+    y0 = (sheet_h - grid_h) // 2
+
+    for n, path in enumerate(card_paths[:cols * rows]):
+        if layout['rotate']:
+            img = open_for_size(path, (tile_h, tile_w), "contain").convert("RGB")
+            img = img.transpose(Image.Transpose.ROTATE_90)
+        else:
+            img = open_for_size(path, (tile_w, tile_h), "contain").convert("RGB")
+        # Cabe inteiro no tile e vai centralizado: card de outra proporção não é esticado
+        img = fit_contain(img, (tile_w, tile_h), allow_upscale=True)
+        col, row = n % cols, n // cols
+        sheet.paste(img, (x0 + col * (tile_w + gutter) + (tile_w - img.width) // 2,
+                          y0 + row * (tile_h + gutter) + (tile_h - img.height) // 2))
+
+    if cut_marks:
+        draw = ImageDraw.Draw(sheet)
+        xs = sorted({x0 + c * (tile_w + gutter) for c in range(cols)} | {x0 + c * (tile_w + gutter) + tile_w for c in range(cols)})
+        ys = sorted({y0 + r * (tile_h + gutter) for r in range(rows)} | {y0 + r * (tile_h + gutter) + tile_h for r in range(rows)})
+        # Marcas só na margem, para não invadir as fotos
+        for x in xs:
+            draw.line([(x, 0), (x, max(0, y0 - 8))], fill="black", width=2)
+            draw.line([(x, min(sheet_h, y0 + grid_h + 8)), (x, sheet_h)], fill="black", width=2)
+        for y in ys:
+            draw.line([(0, y), (max(0, x0 - 8), y)], fill="black", width=2)
+            draw.line([(min(sheet_w, x0 + grid_w + 8), y), (sheet_w, y)], fill="black", width=2)
+    return sheet
+
+
+def save_sheet(sheet, output_folder):
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    fp = os.path.join(output_folder, f"folha_{ts}.jpg")
+    sheet.save(fp, quality=95)
+    try: os.chmod(fp, 0o777)
+    except: pass
+    return fp
@@ -0,0 +1,372 @@
+import io
+import os
+import re
+import json
+import time
+import shlex
+import threading
+import subprocess
+from collections import OrderedDict
+
+from PIL import Image
+
+from image_utils import fast_resize
+from paper_specs import PAPER_SPECS
+from print_imposition import cards_per_sheet, impose, save_sheet
+
+# Estados de um trabalho na fila
+PENDENTE = "pendente"      # aguardando envio (ou nova tentativa)
+ENVIADO = "enviado"        # aceito pelo CUPS, aguardando/imprimindo
+CONCLUIDO = "concluido"
+ERRO = "erro"              # desistiu depois de todas as tentativas
+AGRUPANDO = "agrupando"    # imposição: esperando encher a folha
+
+
+class PrintService:
+    """
+    Fila de impressão persistente. Os trabalhos são enviados ao CUPS em segundo plano
+    (lp), acompanhados pelo lpstat e reenviados em caso de falha. A fila sobrevive a
+    reinícios do app (config/print_queue.json).
+    Os comandos lp/lpstat vêm da config (print_lp_cmd/print_lpstat_cmd) para poderem
+    ser trocados por um substituto de teste (tools/fake_cups.py).
+    Com print_imposicao ligado, os cards esperam (AGRUPANDO) até encher uma folha
+    print_folha ou até print_imposicao_timeout_s, e saem juntos numa folha só.
+    """
+    def __init__(self, config_manager, queue_file="/opt/Totem/config/print_queue.json",
+                 layout_json="/opt/Totem/templates/config_card.json"):
+        self.config_manager = config_manager
+        self.queue_file = queue_file
+        self.layout_json = layout_json
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.listeners = []
+        self.jobs = []
+        self.next_id = 1
+        self._layout_cache = (None, None)
+        self.renditions = OrderedDict()  # (card, mtime, tamanho) -> JPEG convertido
+        self._load()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # --- Configuração ---
+    @property
+    def config(self):
+        return self.config_manager.config
+
+    def _cmd(self, key, default):
+        return shlex.split(self.config.get(key) or default)
+
+    def print_settings(self):
+        """Tamanho alvo e mídia do layout. Relê o config_card.json só quando ele muda."""
+        try: mtime = os.path.getmtime(self.layout_json)
+        except OSError: mtime = None
+        cached_mtime, settings = self._layout_cache
+        if settings and cached_mtime == mtime: return settings
+
+        settings = {'width': 1800, 'height': 1200, 'media': "w288h432"}
+        if mtime is not None:
+            try:
+                with open(self.layout_json) as f: d = json.load(f)
+                settings['width'] = d.get('card_width', 1800)
+                settings['height'] = d.get('card_height', 1200)
+                sz = d.get('print_paper_size', '')
+                if "A4" in sz: settings['media'] = "A4"
+                elif "A5" in sz: settings['media'] = "A5"
+                elif "A6" in sz: settings['media'] = "A6"
+            except Exception as e:
+                print(f"Erro ao ler layout de impressão: {e}")
+        self._layout_cache = (mtime, settings)
+        return settings
+
+    # --- Raster pronto para impressão ---
+    def prepare(self, card_path):
+        """Deixa o raster de impressão pronto logo após a composição (em segundo plano)"""
+        threading.Thread(target=self._print_payload, args=(card_path,), daemon=True).start()
+
+    def _print_payload(self, card_path):
+        """
+        O que mandar ao lp: (arquivo, None) quando o card já está no tamanho de
+        impressão (o caso normal: o compositor gera exatamente card_width x card_height),
+        ou (None, bytes JPEG) quando precisa redimensionar. A versão convertida fica
+        só em memória e vai pelo stdin do lp, sem segunda gravação em disco.
+        """
+        settings = self.print_settings()
+        size = (settings['width'], settings['height'])
+        try:
+            key = (card_path, os.path.getmtime(card_path), size)
+            with self.lock:
+                if key in self.renditions: return None, self.renditions[key]
+
+            with Image.open(card_path) as img:
+                # Só o cabeçalho foi lido até aqui
+                if img.size == size and img.format == 'JPEG': return card_path, None
+                img_resized = fast_resize(img.convert("RGB"), size)
+            buf = io.BytesIO()
+            img_resized.save(buf, format="JPEG", quality=100)
+            data = buf.getvalue()
+            with self.lock:
+                self.renditions[key] = data
+                while len(self.renditions) > 4: self.renditions.popitem(last=False)
+            return None, data
+        except Exception as e:
+            print(f"Erro ao preparar impressão: {e}")
+            return card_path, None
+
+    # --- Fila ---
+    def _load(self):
+        try:
+            with open(self.queue_file) as f: data = json.load(f)
+            self.jobs = data.get('jobs', [])
+            self.next_id = data.get('next_id', len(self.jobs) + 1)
+        except:
+            self.jobs = []
+
+    def _save(self):
+        try:
+            # Guarda só o histórico recente para o arquivo não crescer sem fim
+            active = [j for j in self.jobs if j['status'] in (PENDENTE, ENVIADO, AGRUPANDO)]
+            done = [j for j in self.jobs if j['status'] not in (PENDENTE, ENVIADO, AGRUPANDO)][-50:]
+            self.jobs = sorted(active + done, key=lambda j: j['id'])
+            tmp = self.queue_file + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'jobs': self.jobs, 'next_id': self.next_id}, f, indent=4, ensure_ascii=False)
+            os.replace(tmp, self.queue_file)
+        except Exception as e:
+            print(f"Erro ao salvar fila de impressão: {e}")
+
+    def add_listener(self, callback):
+        """callback(lista_de_trabalhos) é chamado da thread da fila a cada mudança"""
+        self.listeners.append(callback)
+
+    def _notify(self):
+        snapshot = self.snapshot()
+        for cb in list(self.listeners):
+            try: cb(snapshot)
+            except Exception as e: print(f"Erro listener impressão: {e}")
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(j) for j in self.jobs]
+
+    def submit(self, card_path, copies=1):
+        printer = self.config.get('impressora_selecionada')
+        copies = max(1, int(copies))
+        grouped = bool(self.config.get('print_imposicao', False))
+        with self.lock:
+            job = {
+                'id': self.next_id, 'file': card_path, 'copies': copies,
+                'printer': printer, 'status': AGRUPANDO if grouped else PENDENTE, 'cups_id': None,
+                'attempts': 0, 'next_try': 0, 'error': "", 'created': time.time()
+            }
+            # Cada cópia ocupa uma posição na folha
+            if grouped: job['tiles_left'] = copies
+            self.next_id += 1
+            self.jobs.append(job)
+            self._save()
+        print(f"🖨️ Trabalho {job['id']} na fila ({job['copies']} cópia(s))")
+        self._notify()
+        self.wakeup.set()
+        return job
+
+    def retry(self, job_id):
+        grouped = bool(self.config.get('print_imposicao', False))
+        with self.lock:
+            for j in self.jobs:
+                if j['id'] != job_id or j['status'] != ERRO: continue
+                if j.get('sheet'):
+                    # Reenviar a folha traz os cards dela junto
+                    for c in self.jobs:
+                        if c.get('sheet_job') == j['id']: c.update(status=ENVIADO, error="")
+                    j.update(status=PENDENTE, attempts=0, next_try=0, error="")
+                elif grouped:
+                    j.pop('sheet_job', None)
+                    j.update(status=AGRUPANDO, tiles_left=j['copies'], attempts=0, error="", created=time.time())
+                else:
+                    j.pop('sheet_job', None)
+                    j.update(status=PENDENTE, attempts=0, next_try=0, error="")
+            self._save()
+        self._notify()
+        self.wakeup.set()
+
+    # --- Trabalhador ---
+    def _worker(self):
+        while True:
+            self.wakeup.wait(timeout=float(self.config.get('print_poll_s', 3)))
+            self.wakeup.clear()
+            try:
+                self._impose_due()
+                for job in self._due_jobs():
+                    self._send(job)
+                self._poll()
+            except Exception as e:
+                print(f"Erro na fila de impressão: {e}")
+
+    def _due_jobs(self):
+        now = time.time()
+        with self.lock:
+            return [j for j in self.jobs if j['status'] == PENDENTE and j['next_try'] <= now]
+
+    # --- Imposição ---
+    def _sheet_spec(self):
+        name = self.config.get('print_folha') or "A4 (21x30cm)"
+        size = PAPER_SPECS.get(name, PAPER_SPECS["A4 (21x30cm)"])
+        return size, name.split(" ")[0]
+
+    def _impose_due(self):
+        """Fecha folhas: quando há cards para encher uma, ou quando o mais antigo cansou de esperar"""
+        settings = self.print_settings()
+        card_size = (settings['width'], settings['height'])
+        sheet_size, media = self._sheet_spec()
+        per_sheet = cards_per_sheet(card_size, sheet_size)
+        timeout = float(self.config.get('print_imposicao_timeout_s', 60))
+
+        while True:
+            with self.lock:
+                waiting = [j for j in self.jobs if j['status'] == AGRUPANDO]
+                if not waiting: return
+                if per_sheet < 2:
+                    # Folha não comporta mais de um card: segue como trabalho normal
+                    for j in waiting: j['status'] = PENDENTE
+                    self._save()
+                    break
+                tiles = sum(j.get('tiles_left', j['copies']) for j in waiting)
+                if tiles < per_sheet and time.time() - waiting[0]['created'] < timeout: return
+
+                # Reserva as posições desta folha, na ordem de chegada
+                files, cards = [], []
+                for j in waiting:
+                    take = min(j.get('tiles_left', j['copies']), per_sheet - len(files))
+                    if take <= 0: break
+                    files.extend([j['file']] * take)
+                    cards.append(j['id'])
+                    j['tiles_left'] = j.get('tiles_left', j['copies']) - take
+                    if j['tiles_left'] == 0: j['status'] = ENVIADO
+                printer = waiting[0]['printer']
+
+            try:
+                sheet = impose(files, card_size, sheet_size)
+                sheet_path = save_sheet(sheet, os.path.dirname(files[0]))
+            except Exception as e:
+                print(f"Erro na imposição: {e}")
+                with self.lock:
+                    for j in self.jobs:
+                        if j['id'] in cards: j.update(status=ERRO, error=f"Imposição: {e}")
+                    self._save()
+                break
+
+            with self.lock:
+                sheet_job = {
+                    'id': self.next_id, 'file': sheet_path, 'copies': 1,
+                    'printer': printer, 'status': PENDENTE, 'cups_id': None,
+                    'attempts': 0, 'next_try': 0, 'error': "", 'created': time.time(),
+                    'sheet': True, 'media': media, 'cards': cards
+                }
+                self.next_id += 1
+                self.jobs.append(sheet_job)
+                for j in self.jobs:
+                    if j['id'] in cards and j['status'] == ENVIADO: j['sheet_job'] = sheet_job['id']
+                self._save()
+            print(f"📄 Folha {sheet_job['id']}: {len(files)} card(s) de {len(cards)} trabalho(s)")
+        self._notify()
+
+    def _finish_cards(self, sheet_job, **changes):
+        """Os cards de uma folha seguem o estado dela"""
+        with self.lock:
+            for j in self.jobs:
+                if j.get('sheet_job') == sheet_job['id']:
+                    j.update(changes)
+
+    def _send(self, job):
+        if job.get('sheet'):
+            # Folha já montada no tamanho do papel
+            media = job['media']
+            print_file, data = job['file'], None
+        else:
+            media = self.print_settings()['media']
+            print_file, data = self._print_payload(job['file'])
+        cmd = self._cmd('print_lp_cmd', 'lp') + [
+            '-d', job['printer'], '-n', str(job['copies']),
+            '-o', f"media={media}", '-o', 'fit-to-page'
+        ]
+        if self.config.get('print_borderless', False): cmd.extend(['-o', 'stpi-border=borderless'])
+        # Sem arquivo, o lp lê o JPEG do stdin
+        if print_file: cmd.append(print_file)
+
+        print(f"🚀 Executando Print: {cmd}" + (f" (stdin {len(data) // 1024} KB)" if data else ""))
+        try:
+            result = subprocess.run(cmd, input=data, capture_output=True, timeout=20)
+            out = result.stdout.decode(errors='replace')
+            err = result.stderr.decode(errors='replace')
+            match = re.search(r'request id is (\S+)', out)
+            if result.returncode != 0 or not match:
+                raise Exception((err or out).strip() or f"lp saiu com {result.returncode}")
+            self._update(job, status=ENVIADO, cups_id=match.group(1), error="")
+        except Exception as e:
+            self._fail(job, str(e))
+
+    def _fail(self, job, error):
+        attempts = job['attempts'] + 1
+        max_retries = int(self.config.get('print_max_retries', 3))
+        if attempts < max_retries:
+            # Espera um pouco mais a cada tentativa
+            self._update(job, status=PENDENTE, attempts=attempts, error=error, next_try=time.time() + 5 * attempts)
+        else:
+            if job.get('sheet'): self._finish_cards(job, status=ERRO, error=error)
+            self._update(job, status=ERRO, attempts=attempts, error=error)
+        print(f"❌ Falha na impressão {job['id']} (tentativa {attempts}): {error}")
+
+    def _poll(self):
+        with self.lock:
+            # Cards impostos não têm id no CUPS: acompanham a folha
+            sent = [j for j in self.jobs if j['status'] == ENVIADO and j.get('cups_id')]
+        if not sent: return
+        try:
+            active = self._lpstat_ids(['-o'])
+            finished = self._lpstat_reasons(['-l', '-W', 'completed', '-o'])
+        except Exception as e:
+            print(f"Erro consultando lpstat: {e}")
+            return
+        grace = float(self.config.get('print_sumido_s', 120))
+        for job in sent:
+            if job['cups_id'] in active:
+                if job.get('missing_since'): self._update(job, missing_since=None)
+                continue
+            reasons = finished.get(job['cups_id'])
+            if reasons is None:
+                # Fora das duas listas: CUPS sem histórico (PreserveJobHistory No, MaxJobs)
+                # apaga os concluídos. Estado desconhecido: nunca reenvia, só espera.
+                if not job.get('missing_since'):
+                    self._update(job, missing_since=time.time())
+                    continue
+                if time.time() - job['missing_since'] < grace: continue
+            else:
+                # Cancelados/abortados também ficam na lista de concluídos: esses voltam para a fila
+                failed = [r for r in reasons if r.startswith(('job-canceled', 'job-aborted'))]
+                if failed:
+                    self._fail(job, f"CUPS: {', '.join(failed)}")
+                    continue
+            if job.get('sheet'): self._finish_cards(job, status=CONCLUIDO)
+            self._update(job, status=CONCLUIDO, missing_since=None)
+
+    def _lpstat_ids(self, args):
+        result = subprocess.run(self._cmd('print_lpstat_cmd', 'lpstat') + args, capture_output=True, text=True, timeout=10)
+        return {line.split()[0] for line in result.stdout.splitlines() if line.strip()}
+
+    def _lpstat_reasons(self, args):
+        """id do trabalho -> motivos do estado (linha 'Alerts:' do lpstat -l)"""
+        result = subprocess.run(self._cmd('print_lpstat_cmd', 'lpstat') + args, capture_output=True, text=True, timeout=10)
+        jobs, current = {}, None
+        for line in result.stdout.splitlines():
+            if not line.strip(): continue
+            if not line[0].isspace():
+                current = line.split()[0]
+                jobs[current] = []
+            elif current and line.strip().startswith("Alerts:"):
+                jobs[current] = line.split(":", 1)[1].split()
+        return jobs
+
+    def _update(self, job, **changes):
+        with self.lock:
+            job.update(changes)
+            self._save()
+        self._notify()
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+# Índice das sessões em SQLite: cada card com suas fotos, tempos e estado de
+# impressão/envio. Permite reimprimir ou reenviar qualquer convidado anterior
+# sem varrer a pasta de saída.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    card_path TEXT NOT NULL,
+    photos TEXT NOT NULL DEFAULT '[]',
+    timings TEXT NOT NULL DEFAULT '{}',
+    print_status TEXT,
+    print_job INTEGER,
+    send_status TEXT,
+    phone TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created);
+CREATE INDEX IF NOT EXISTS idx_sessions_card ON sessions(card_path);
+CREATE INDEX IF NOT EXISTS idx_sessions_print ON sessions(print_status, created);
+CREATE INDEX IF NOT EXISTS idx_sessions_send ON sessions(send_status, created);
+"""
+
+# Estados de envio pelo WhatsApp
+ENVIO_OK = "enviado"
+ENVIO_ERRO = "erro"
+
+
+class SessionIndex:
+    def __init__(self, db_path="/opt/Totem/config/sessions.db"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.print_seen = {}  # id do trabalho -> último estado gravado
+        self.backfilled = set()  # pastas já importadas neste processo
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Uma conexão compartilhada entre as threads (Tk, fila de impressão, envio)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        try: self.conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError: pass
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _write(self, sql, args=()):
+        with self.lock:
+            cur = self.conn.execute(sql, args)
+            self.conn.commit()
+            return cur.rowcount
+
+    def _query(self, sql, args=()):
+        with self.lock:
+            return [self._row(r) for r in self.conn.execute(sql, args).fetchall()]
+
+    @staticmethod
+    def _row(r):
+        d = dict(r)
+        d['photos'] = json.loads(d['photos'] or '[]')
+        d['timings'] = json.loads(d['timings'] or '{}')
+        return d
+
+    # --- Gravação ---
+    def add_session(self, card_path, photos=None, timings=None):
+        """Registra a sessão concluída e devolve o id"""
+        now = time.time()
+        session_id = datetime.fromtimestamp(now).strftime('%Y%m%d_%H%M%S_%f')
+        self._write(
+            "INSERT INTO sessions (id, created, card_path, photos, timings, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, now, card_path, json.dumps(list(photos or [])), json.dumps(timings or {}), now)
+        )
+        return session_id
+
+    def backfill_folder(self, folder):
+        """
+        Importa (uma vez por processo) os card_final_*.jpg da pasta que ainda não estão
+        no índice, com a data do arquivo. Cards anteriores ao índice seguem na galeria.
+        """
+        if folder in self.backfilled: return 0
+        self.backfilled.add(folder)
+        try:
+            cards = [(e.path, e.stat().st_mtime) for e in os.scandir(folder)
+                     if e.name.startswith("card_final_") and e.name.endswith(".jpg")]
+        except OSError:
+            return 0
+        with self.lock:
+            known = {os.path.abspath(r[0]) for r in self.conn.execute("SELECT card_path FROM sessions")}
+            rows = [(f"legado_{os.path.basename(path)[len('card_final_'):-len('.jpg')]}", mtime, path, mtime)
+                    for path, mtime in cards if os.path.abspath(path) not in known]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO sessions (id, created, card_path, updated) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def set_print_status(self, card_path, status, job_id=None):
+        return self._write(
+            "UPDATE sessions SET print_status = ?, print_job = COALESCE(?, print_job), updated = ? WHERE card_path = ?",
+            (status, job_id, time.time(), card_path)
+        )
+
+    def set_send_status(self, session_id, status, phone=None):
+        return self._write(
+            "UPDATE sessions SET send_status = ?, phone = COALESCE(?, phone), updated = ? WHERE id = ?",
+            (status, phone, time.time(), session_id)
+        )
+
+    def record_print_jobs(self, jobs):
+        """Listener da fila de impressão: grava só os trabalhos que mudaram de estado"""
+        for job in jobs:
+            if job.get('sheet'): continue
+            if self.print_seen.get(job['id']) == job['status']: continue
+            self.print_seen[job['id']] = job['status']
+            try: self.set_print_status(job['file'], job['status'], job['id'])
+            except sqlite3.Error as e: print(f"Erro ao gravar impressão no índice: {e}")
+
+    # --- Consultas ---
+    def get(self, session_id):
+        rows = self._query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        return rows[0] if rows else None
+
+    def by_card(self, card_path):
+        rows = self._query("SELECT * FROM sessions WHERE card_path = ? ORDER BY created DESC LIMIT 1", (card_path,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=50, offset=0):
+        return self._query("SELECT * FROM sessions ORDER BY created DESC LIMIT ? OFFSET ?", (limit, offset))
+
+    def between(self, start, end, limit=500):
+        """Sessões entre dois instantes (epoch), mais novas primeiro"""
+        return self._query(
+            "SELECT * FROM sessions WHERE created >= ? AND created < ? ORDER BY created DESC LIMIT ?",
+            (start, end, limit)
+        )
+
+    def by_print_status(self, status, limit=500):
+        return self._query(
+            "SELECT * FROM sessions WHERE print_status IS ? ORDER BY created DESC LIMIT ?", (status, limit)
+        )
+
+    def by_send_status(self, status, limit=500):
+        return self._query(
+            "SELECT * FROM sessions WHERE send_status IS ? ORDER BY created DESC LIMIT ?", (status, limit)
+        )
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_session_index():
+    """Índice único compartilhado no processo"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SessionIndex()
+        return _index
@@ -0,0 +1,98 @@
+import os
+import json
+import threading
+from PIL import Image
+
+from image_utils import fit_cover, fast_resize
+
+
+class TemplateCache:
+    """
+    Versões pré-redimensionadas do background.png (tamanho da tela e do card).
+    Ficam em memória e em disco (templates/.cache), e são refeitas só quando o
+    background.png ou o config_card.json mudam (mtime/tamanho).
+    """
+    def __init__(self, template_dir="/opt/Totem/templates"):
+        self.template_dir = template_dir
+        self.bg_path = os.path.join(template_dir, "background.png")
+        self.json_path = os.path.join(template_dir, "config_card.json")
+        self.cache_dir = os.path.join(template_dir, ".cache")
+        self.lock = threading.Lock()
+        self.memory = {}  # (modo, w, h) -> (assinatura, imagem)
+
+    def signature(self):
+        sig = []
+        for p in (self.bg_path, self.json_path):
+            try:
+                st = os.stat(p)
+                sig.append([st.st_mtime_ns, st.st_size])
+            except OSError:
+                sig.append(None)
+        return sig
+
+    def get(self, size, mode="resize"):
+        """
+        Retorna uma cópia RGBA do fundo no tamanho pedido, ou None se não houver background.png.
+        mode: 'resize' (estica para o tamanho do card) ou 'cover' (preenche a tela recortando).
+        """
+        sig = self.signature()
+        if sig[0] is None: return None
+        key = (mode, int(size[0]), int(size[1]))
+
+        with self.lock:
+            cached = self.memory.get(key)
+            if cached and cached[0] == sig:
+                return cached[1].copy()
+
+            img = self._load_from_disk(key, sig)
+            if img is None:
+                img = self._render(key)
+                self._save_to_disk(key, sig, img)
+            self.memory[key] = (sig, img)
+            return img.copy()
+
+    def _disk_paths(self, key):
+        mode, w, h = key
+        base = os.path.join(self.cache_dir, f"background_{mode}_{w}x{h}")
+        return base + ".png", base + ".json"
+
+    def _load_from_disk(self, key, sig):
+        img_path, sig_path = self._disk_paths(key)
+        try:
+            with open(sig_path) as f:
+                if json.load(f) != sig: return None
+            img = Image.open(img_path)
+            img.load()
+            return img.convert("RGBA")
+        except: return None
+
+    def _render(self, key):
+        mode, w, h = key
+        src = Image.open(self.bg_path).convert("RGBA")
+        if mode == "cover":
+            return fit_cover(src, (w, h))
+        return fast_resize(src, (w, h))
+
+    def _save_to_disk(self, key, sig, img):
+        img_path, sig_path = self._disk_paths(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Grava em arquivo temporário e renomeia: outros processos nunca leem pela metade
+            tmp = f"{img_path}.{os.getpid()}.tmp"
+            img.save(tmp, format="PNG", compress_level=1)
+            os.replace(tmp, img_path)
+            with open(sig_path, 'w') as f: json.dump(sig, f)
+        except Exception as e:
+            print(f"Erro ao gravar cache do template: {e}")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_template_cache(template_dir="/opt/Totem/templates"):
+    """Um cache por pasta de templates, compartilhado no processo"""
+    with _caches_lock:
+        cache = _caches.get(template_dir)
+        if cache is None:
+            cache = _caches[template_dir] = TemplateCache(template_dir)
+        return cache
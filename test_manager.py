@@ -3,7 +3,9 @@ from tkinter import ttk, scrolledtext
 import threading
 import time
 import os
-from PIL import Image, ImageTk
+from PIL import ImageTk
+
+from image_utils import load_fitted
 
 # Importações dos serviços
 from camera_service import CameraService
@@ -128,9 +130,15 @@ class TestWindow:
                                 command=self.stop_liveview, width=15, state='disabled')
         self.stop_btn.pack(side='left', padx=10)
         
+        tk.Button(btn_frame, text="📄 SALVAR MÉTRICAS", font=('Arial', 12), bg='#34495e', fg='white',
+                  command=self.dump_liveview_metrics, width=18).pack(side='left', padx=10)
+        
         self.liveview_status = tk.Label(frame, text="", bg='#1a1a1a', fg='white')
         self.liveview_status.pack()
         
+        self.liveview_metrics = tk.Label(frame, text="", font=('Courier', 11), bg='#1a1a1a', fg='#bdc3c7')
+        self.liveview_metrics.pack()
+        
         self.video_label = tk.Label(frame, bg='black')
         self.video_label.pack(expand=True, fill='both', padx=20, pady=20)
 
@@ -191,17 +199,14 @@ class TestWindow:
 
             print(f"🖼️ Carregando imagem na tela: {filepath}")
             
-            # Carrega imagem
-            img = Image.open(filepath)
-            
-            # Redimensiona mantendo proporção
             # Pega tamanho da área disponível
             lbl_w = self.photo_label.winfo_width()
             lbl_h = self.photo_label.winfo_height()
             if lbl_w < 100: lbl_w = 600 # Fallback se a janela ainda não renderizou
             if lbl_h < 100: lbl_h = 400
             
-            img.thumbnail((lbl_w, lbl_h), Image.Resampling.LANCZOS)
+            # Carrega já reduzida, mantendo proporção
+            img = load_fitted(filepath, (lbl_w, lbl_h), "contain")
             
             # Converte para Tkinter
             photo = ImageTk.PhotoImage(img)
@@ -223,6 +228,17 @@ class TestWindow:
         self.start_btn.config(state='disabled')
         self.stop_btn.config(state='normal')
         threading.Thread(target=lambda: self.test_manager.test_liveview(self.video_label, update_status), daemon=True).start()
+        self.window.after(1000, self._refresh_liveview_metrics)
+
+    def _refresh_liveview_metrics(self):
+        service = self.test_manager.liveview_service
+        if not service.running or not self.window.winfo_exists(): return
+        self.liveview_metrics.config(text=service.metrics.summary())
+        self.window.after(1000, self._refresh_liveview_metrics)
+
+    def dump_liveview_metrics(self):
+        ok = self.test_manager.liveview_service.metrics.dump()
+        self.liveview_status.config(text="📄 Métricas salvas em logs/liveview_metrics.log" if ok else "❌ Erro ao salvar métricas")
 
     def stop_liveview(self):
         self.test_manager.stop_liveview()
@@ -0,0 +1,55 @@
+import os
+import hashlib
+import threading
+from PIL import Image
+
+from image_utils import load_fitted
+
+THUMB_SIZE = (320, 214)
+
+
+class ThumbnailCache:
+    """
+    Miniaturas persistentes dos cards/fotos, geradas uma única vez por arquivo.
+    A chave é caminho + mtime + tamanho: se o arquivo mudar, a miniatura é refeita.
+    """
+    def __init__(self, cache_dir="/opt/Totem/cache/thumbs", size=THUMB_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+
+    def thumb_path(self, path):
+        st = os.stat(path)
+        key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size[0]}x{self.size[1]}"
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        # Subpastas pelo início do hash: milhares de miniaturas sem diretório gigante
+        return os.path.join(self.cache_dir, digest[:2], digest + ".jpg")
+
+    def get(self, path):
+        """Caminho da miniatura, gerando se preciso. Chamar fora da thread do Tk."""
+        target = self.thumb_path(path)
+        if os.path.exists(target): return target
+
+        # Decodificação JPEG reduzida (draft): nunca abre o card em resolução cheia
+        img = load_fitted(path, self.size, "contain")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{threading.get_ident()}.tmp"
+        img.convert("RGB").save(tmp, format="JPEG", quality=85)
+        os.replace(tmp, target)
+        return target
+
+    def load(self, path):
+        """Imagem PIL da miniatura, já carregada"""
+        with Image.open(self.get(path)) as img:
+            img.load()
+            return img.copy()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_thumbnail_cache(cache_dir="/opt/Totem/cache/thumbs"):
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = ThumbnailCache(cache_dir)
+        return cache
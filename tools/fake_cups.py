@@ -0,0 +1,71 @@
+"""
+Substituto de lp/lpstat para testar a fila de impressão sem impressora.
+
+Config do totem:
+    "print_lp_cmd": "python3 /opt/Totem/tools/fake_cups.py lp",
+    "print_lpstat_cmd": "python3 /opt/Totem/tools/fake_cups.py lpstat"
+
+Cada trabalho "imprime" por FAKE_CUPS_SECONDS (padrão 5 s) e depois aparece como
+concluído. FAKE_CUPS_FAIL=1 faz o lp recusar todos os envios e
+FAKE_CUPS_NO_HISTORY=1 imita o CUPS sem histórico (concluídos somem do lpstat) e
+FAKE_CUPS_CANCEL=1 faz todo trabalho terminar cancelado na impressora.
+"""
+import os
+import sys
+import json
+import time
+
+STATE_FILE = os.environ.get("FAKE_CUPS_STATE", "/tmp/fake_cups.json")
+PRINT_SECONDS = float(os.environ.get("FAKE_CUPS_SECONDS", "5"))
+
+
+def load():
+    try:
+        with open(STATE_FILE) as f: return json.load(f)
+    except: return {'next_id': 1, 'jobs': []}
+
+
+def save(state):
+    with open(STATE_FILE, 'w') as f: json.dump(state, f, indent=2)
+
+
+def lp(args):
+    if os.environ.get("FAKE_CUPS_FAIL") == "1":
+        print("lp: Unable to connect to printer.", file=sys.stderr)
+        return 1
+    printer = args[args.index('-d') + 1] if '-d' in args else "Fake"
+    # Sem arquivo no fim dos argumentos = dados pelo stdin (como o lp de verdade)
+    files = [a for a in args if os.path.isfile(a)]
+    size = os.path.getsize(files[-1]) if files else len(sys.stdin.buffer.read())
+    state = load()
+    job_id = f"{printer}-{state['next_id']}"
+    state['next_id'] += 1
+    state['jobs'].append({'id': job_id, 'size': size, 'created': time.time(), 'args': args})
+    save(state)
+    print(f"request id is {job_id} (1 file(s))")
+    return 0
+
+
+def lpstat(args):
+    state = load()
+    now = time.time()
+    which = args[args.index('-W') + 1] if '-W' in args else 'not-completed'
+    no_history = os.environ.get("FAKE_CUPS_NO_HISTORY") == "1"
+    for job in state['jobs']:
+        done = now - job['created'] >= PRINT_SECONDS
+        if done and no_history: continue
+        if which == 'all' or done == (which == 'completed'):
+            print(f"{job['id']} totem {job['size']} {time.ctime(job['created'])}")
+            if '-l' in args:
+                if not done: reason = "job-printing"
+                elif os.environ.get("FAKE_CUPS_CANCEL") == "1": reason = "job-canceled-at-device"
+                else: reason = "job-completed-successfully"
+                print(f"\tAlerts: {reason}")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("lp", "lpstat"):
+        print("uso: fake_cups.py lp|lpstat [args...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(lp(sys.argv[2:]) if sys.argv[1] == "lp" else lpstat(sys.argv[2:]))
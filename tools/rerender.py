@@ -0,0 +1,131 @@
+"""
+Refaz os cards de sessões já fotografadas com outro layout (moldura nova no meio
+do evento), sem Tk e usando todos os núcleos.
+
+As sessões vêm do índice (config/sessions.db) ou, para fotos anteriores a ele,
+dos foto_AAAAMMDD_HHMMSS_N.jpg da pasta de saída (uma sessão a cada foto 1).
+
+Uso:
+    python3 tools/rerender.py --layout /opt/Totem/templates --pasta /opt/Totem/fotos
+    python3 tools/rerender.py --fonte pasta --desde 20250101_180000 --workers 4
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_composer import compose_card
+from template_cache import get_template_cache
+from session_index import SessionIndex
+
+FOTO_RE = re.compile(r'^foto_(\d{8}_\d{6})_(\d+)\.jpg$')
+
+
+def sessions_from_index(db_path):
+    if not os.path.exists(db_path): return []
+    index = SessionIndex(db_path)
+    sessions = []
+    for s in reversed(index.recent(limit=-1)):
+        if not s['photos']: continue
+        ts = os.path.basename(s['card_path'])[len("card_final_"):-len(".jpg")]
+        photos = []
+        for n, path in enumerate(s['photos']):
+            # O número do slot está no nome (foto_..._N.jpg); se faltar, vale a ordem
+            m = FOTO_RE.match(os.path.basename(path))
+            photos.append((int(m.group(2)) - 1 if m else n, path))
+        sessions.append({'id': ts, 'photos': photos})
+    index.close()
+    return sessions
+
+
+def sessions_from_folder(pasta):
+    """Agrupa as fotos soltas por ordem de horário: cada foto 1 abre uma sessão nova"""
+    fotos = []
+    for e in os.scandir(pasta):
+        m = FOTO_RE.match(e.name)
+        if m: fotos.append((m.group(1), int(m.group(2)), e.path))
+    fotos.sort()
+
+    sessions = []
+    for ts, slot, path in fotos:
+        if slot == 1 or not sessions or slot - 1 in dict(sessions[-1]['photos']):
+            sessions.append({'id': ts, 'photos': []})
+        sessions[-1]['photos'].append((slot - 1, path))
+    return sessions
+
+
+def render_one(layout_data, bg_path, session, output_folder):
+    """Roda no processo filho: compõe um card e devolve (id, caminho, segundos)"""
+    start = time.perf_counter()
+    path = compose_card(layout_data, bg_path, session['photos'], output_folder,
+                        filename=f"card_final_{session['id']}.jpg")
+    return session['id'], path, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", default="/opt/Totem/templates", help="pasta com config_card.json e background.png")
+    parser.add_argument("--pasta", default="/opt/Totem/fotos", help="pasta de saída do totem (fotos das sessões)")
+    parser.add_argument("--saida", default=None, help="onde gravar os cards novos (padrão: <pasta>/rerender_<data>)")
+    parser.add_argument("--fonte", choices=("auto", "indice", "pasta"), default="auto")
+    parser.add_argument("--db", default="/opt/Totem/config/sessions.db")
+    parser.add_argument("--desde", default=None, help="só sessões a partir de AAAAMMDD_HHMMSS")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    json_path = os.path.join(args.layout, "config_card.json")
+    bg_path = os.path.join(args.layout, "background.png")
+    try:
+        with open(json_path) as f: layout_data = json.load(f)
+    except Exception as e:
+        print(f"❌ Layout inválido ({json_path}): {e}")
+        return 1
+
+    sessions = []
+    if args.fonte in ("auto", "indice"): sessions = sessions_from_index(args.db)
+    if not sessions and args.fonte in ("auto", "pasta"): sessions = sessions_from_folder(args.pasta)
+    if args.desde: sessions = [s for s in sessions if s['id'] >= args.desde]
+    if not sessions:
+        print("Nenhuma sessão encontrada.")
+        return 1
+
+    output_folder = args.saida or os.path.join(args.pasta, f"rerender_{time.strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Fundo redimensionado uma vez aqui; os processos leem do cache em disco
+    get_template_cache(args.layout).get((layout_data.get('card_width', 1800), layout_data.get('card_height', 1200)), "resize")
+
+    print(f"🎨 {len(sessions)} sessão(ões) -> {output_folder} ({args.workers} processos)")
+    try: ctx = multiprocessing.get_context('forkserver')
+    except ValueError: ctx = multiprocessing.get_context()
+
+    start = time.perf_counter()
+    timings, falhas = [], 0
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx) as pool:
+        futures = [pool.submit(render_one, layout_data, bg_path, s, output_folder) for s in sessions]
+        for n, future in enumerate(as_completed(futures), 1):
+            try:
+                session_id, path, secs = future.result()
+            except Exception as e:
+                session_id, path, secs = "?", None, 0
+                print(f"Erro no processo: {e}")
+            if path: timings.append(secs)
+            else: falhas += 1
+            status = os.path.basename(path) if path else "❌ falhou"
+            print(f"[{n}/{len(sessions)}] {session_id}: {status} ({secs * 1000:.0f} ms)", flush=True)
+
+    total = time.perf_counter() - start
+    print(f"✅ {len(timings)} card(s) em {total:.1f}s ({len(timings) / total:.2f} cards/s)"
+          + (f", média {sum(timings) / len(timings) * 1000:.0f} ms por card" if timings else "")
+          + (f", {falhas} falha(s)" if falhas else ""))
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import os
+import re
+import glob
 import time
 import shutil
+import subprocess
 import tkinter as tk
 from tkinter import messagebox, Toplevel
 from selenium import webdriver
@@ -11,14 +14,53 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import threading
 
+WHATSAPP_URL = "https://web.whatsapp.com"
+HEALTH_CHECK_S = 60
+CHROME_BINARIES = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+
+# Tempo máximo de cada etapa do envio (s); a config pode trocar com whatsapp_timeout_<etapa>_s
+STEP_TIMEOUTS = {'menu': 5, 'previa': 30, 'confirmacao': 120}
+
+SEND_BUTTON = (By.XPATH, '//span[@data-icon="send"]')
+OUTGOING = (By.CSS_SELECTOR, 'div.message-out')
+PENDING_ICON = 'span[data-icon="msg-time"]'
+# data-id da mensagem fica num ancestral do balão (ou dentro dele, conforme a versão)
+MESSAGE_ID_JS = "const m = arguments[0].closest('[data-id]') || arguments[0].querySelector('[data-id]'); return m && m.getAttribute('data-id');"
+SENT_ICONS = 'span[data-icon^="msg-check"], span[data-icon^="msg-dblcheck"]'
+
+
+def _binary_version(cmd):
+    """Versão completa ('120.0.6099.109') de um binário com --version, ou None"""
+    try:
+        out = subprocess.run([cmd, "--version"], capture_output=True, text=True, timeout=5).stdout
+        m = re.search(r'(\d+)\.(\d+)\.(\d+)\.(\d+)', out)
+        return m.group(0) if m else None
+    except Exception: return None
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
 class WhatsAppService:
-    def __init__(self):
+    """
+    Envio pelo WhatsApp Web. O Chrome (headless) fica aberto em segundo plano com o
+    WhatsApp já carregado; cada envio só abre a conversa e anexa. O navegador é
+    verificado periodicamente e só é reiniciado quando morre.
+    """
+    def __init__(self, config_manager=None):
+        self.config_manager = config_manager
         self.base_dir = "/opt/Totem/redes"
         self.session_dir = os.path.join(self.base_dir, "whatsapp_session")
         self.ensure_dirs()
+        self.driver = None
+        self.lock = threading.RLock()  # um uso do navegador por vez (envio, aquecimento, verificação)
+        self.last_timings = {}
+        self.stop_event = None
+        self.chromedriver = None  # caminho resolvido uma vez; cada navegador tem o seu Service
         
     def ensure_dirs(self):
         if not os.path.exists(self.base_dir):
@@ -42,10 +84,120 @@ class WhatsAppService:
         
         chrome_options.add_argument("user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
 
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        # Service novo a cada navegador: cada um sobe o próprio processo/porta do chromedriver
+        driver = webdriver.Chrome(service=Service(self.chromedriver_path()), options=chrome_options)
         return driver
 
+    # --- chromedriver ---
+    def chromedriver_path(self):
+        """Caminho do chromedriver, resolvido só na primeira vez (sem rede no caso normal)"""
+        with self.lock:
+            if self.chromedriver is None:
+                start = time.time()
+                self.chromedriver = self.resolve_chromedriver()
+                print(f"✅ chromedriver: {self.chromedriver} ({time.time() - start:.2f}s)")
+            return self.chromedriver
+
+    def resolve_chromedriver(self):
+        """
+        Ordem: caminho da config (chromedriver_path) -> chromedriver no PATH com a
+        mesma versão principal do Chrome -> cache local do webdriver_manager (~/.wdm)
+        -> download pelo ChromeDriverManager (única etapa que usa a rede).
+        """
+        config = self.config_manager.config if self.config_manager else {}
+        configured = config.get('chromedriver_path', '')
+        if configured and os.access(configured, os.X_OK):
+            return configured
+        if configured: print(f"⚠️ chromedriver_path inválido: {configured}")
+
+        chrome_major = None
+        for name in CHROME_BINARIES:
+            binary = shutil.which(name)
+            if binary:
+                chrome_major = _major(_binary_version(binary))
+                if chrome_major: break
+
+        in_path = shutil.which("chromedriver")
+        if in_path and (chrome_major is None or _major(_binary_version(in_path)) == chrome_major):
+            return in_path
+
+        # Cache do webdriver_manager: ~/.wdm/drivers/chromedriver/<so>/<versão>/.../chromedriver
+        cached = []
+        for path in glob.glob(os.path.expanduser("~/.wdm/drivers/chromedriver/**/chromedriver"), recursive=True):
+            if not os.access(path, os.X_OK): continue
+            m = re.search(r'/(\d+)\.(\d+)\.(\d+)\.(\d+)/', path)
+            if m and (chrome_major is None or m.group(1) == chrome_major):
+                cached.append((tuple(int(v) for v in m.groups()), path))
+        if cached:
+            return max(cached)[1]
+
+        print("⚠️ chromedriver local não encontrado. Baixando (precisa de internet)...")
+        return ChromeDriverManager().install()
+
+    # --- Navegador persistente ---
+    def start_background(self):
+        """Aquece o navegador e passa a verificá-lo periodicamente (chamar na abertura do app)"""
+        if self.stop_event and not self.stop_event.is_set(): return
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._health_loop, args=(self.stop_event,), daemon=True).start()
+
+    def _health_loop(self, stop_event):
+        # Resolve o chromedriver já na abertura, antes do primeiro envio
+        try: self.chromedriver_path()
+        except Exception as e: print(f"⚠️ WhatsApp: chromedriver não resolvido: {e}")
+        while not stop_event.is_set():
+            if self.is_logged_in():
+                try: self.ensure_driver()
+                except Exception as e: print(f"⚠️ WhatsApp: falha ao aquecer navegador: {e}")
+            stop_event.wait(HEALTH_CHECK_S)
+
+    def _driver_alive(self):
+        if not self.driver: return False
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except: return False
+
+    def ensure_driver(self):
+        """Navegador vivo e com o WhatsApp Web carregado; reinicia só se ele tiver morrido"""
+        with self.lock:
+            if self._driver_alive(): return self.driver
+            if self.driver:
+                print("⚠️ WhatsApp: navegador parou de responder. Reiniciando...")
+            self._quit_driver()
+            # Só os Chrome presos a este perfil (o perfil não abre em dois processos)
+            os.system(f"pkill -f 'user-data-dir={self.session_dir}'")
+            time.sleep(0.5)
+            start = time.time()
+            self.driver = self.get_driver(headless=True)
+            self.driver.get(WHATSAPP_URL)
+            try:
+                WebDriverWait(self.driver, 60).until(EC.presence_of_element_located((By.ID, 'pane-side')))
+            except:
+                print("⚠️ WhatsApp: lista de conversas não apareceu (sessão expirada?)")
+            print(f"✅ WhatsApp: navegador pronto em {time.time() - start:.1f}s")
+            return self.driver
+
+    def _quit_driver(self):
+        if self.driver:
+            try: self.driver.quit()
+            except: pass
+        self.driver = None
+
+    def close(self):
+        """Fecha o navegador persistente (saída do app, conectar/desconectar)"""
+        if self.stop_event: self.stop_event.set()
+        with self.lock:
+            self._quit_driver()
+
+    def open_chat(self, driver, phone, timeout=60):
+        """
+        Abre a conversa pelo link /send. O navegador já está aquecido e logado;
+        só a página é recarregada.
+        """
+        driver.get(f"{WHATSAPP_URL}/send?phone={phone}")
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.TAG_NAME, 'footer')))
+
     def highlight(self, element, driver):
         try:
             driver.execute_script("arguments[0].setAttribute('style', 'border: 4px solid red; background: yellow;');", element)
@@ -70,7 +222,9 @@ class WhatsAppService:
 
         def conectar():
             if messagebox.askyesno("Conectar", "O navegador vai abrir VISÍVEL para você escanear.\n\n1. Escaneie o QR.\n2. Espere carregar.\n3. FECHE O NAVEGADOR MANUALMENTE.\n4. Clique em OK."):
+                driver = None
                 try:
+                    self.close()
                     os.system("pkill -f chrome")
                     time.sleep(1)
                     # Para conectar, SEMPRE headless=False (Visível)
@@ -81,15 +235,26 @@ class WhatsAppService:
                             _ = driver.window_handles
                             time.sleep(1)
                         except: break
+                    # Encerra o chromedriver da janela visível antes de subir o oculto
+                    try: driver.quit()
+                    except: pass
+                    driver = None
                     lbl_status.config(text="✅ Verifique status acima", fg='#f1c40f')
+                    # Volta a manter o navegador oculto aquecido, já com a sessão nova
+                    self.start_background()
                     messagebox.showinfo("Fim", "Processo finalizado.")
                     win.destroy()
                 except Exception as e:
                     messagebox.showerror("Erro", str(e))
+                finally:
+                    if driver:
+                        try: driver.quit()
+                        except: pass
 
         def desconectar():
             if messagebox.askyesno("Desconectar", "Apagar sessão?"):
                 try:
+                    self.close()
                     os.system("pkill -f chrome")
                     time.sleep(1)
                     if os.path.exists(self.session_dir):
@@ -106,106 +271,140 @@ class WhatsAppService:
     def send_files_process(self, phone, files, progress_callback):
         """
         progress_callback(current_step, total_steps, message)
+        Tempos de cada fase ficam em self.last_timings.
         """
-        driver = None
+        with self.lock:
+            return self._send_files(phone, files, progress_callback)
+
+    def _find_attach_button(self, driver):
+        # Tenta por nome primeiro
+        xpaths_attach = ['//div[@title="Anexar"]', '//span[@data-icon="plus"]']
+        for xp in xpaths_attach:
+            try: return driver.find_element(By.XPATH, xp)
+            except: pass
+
+        # Fallback por Posição (Ignorando Emoji)
+        try:
+            footer = driver.find_element(By.TAG_NAME, 'footer')
+            buttons = footer.find_elements(By.CSS_SELECTOR, 'div[role="button"], button')
+            for btn in buttons:
+                icon = btn.get_attribute('data-icon') or ""
+                if 'smiley' in icon or 'emoji' in (btn.get_attribute('title') or "").lower(): continue
+                return btn
+        except: pass
+        return None
+
+    def _find_file_input(self, driver):
+        """Prefere o input de 'Fotos e vídeos' (accept image/*): envia como foto, não como documento"""
+        inputs = driver.find_elements(By.XPATH, '//input[@type="file"]')
+        if not inputs: raise Exception("Campo de arquivo não encontrado")
+        for el in inputs:
+            if 'image' in (el.get_attribute('accept') or ""): return el
+        return inputs[0]
+
+    def _timeout(self, step):
+        config = self.config_manager.config if self.config_manager else {}
+        return float(config.get(f'whatsapp_timeout_{step}_s', STEP_TIMEOUTS[step]))
+
+    def _wait(self, driver, step, condition, timings):
+        """Espera a condição da etapa, registrando quanto levou"""
+        t = time.time()
         try:
-            total_steps = len(files) + 2 # +2 para abrir whats e finalizar
-            current_step = 0
+            return WebDriverWait(driver, self._timeout(step), poll_frequency=0.1,
+                                 ignored_exceptions=(StaleElementReferenceException,)).until(condition)
+        finally:
+            timings[step] = timings.get(step, 0) + time.time() - t
+
+    def _last_outgoing(self, driver):
+        """(data-id, balão) da última mensagem enviada visível na conversa"""
+        bubbles = driver.find_elements(*OUTGOING)
+        if not bubbles: return None, None
+        return driver.execute_script(MESSAGE_ID_JS, bubbles[-1]), bubbles[-1]
+
+    def _delivered(self, before_id):
+        """
+        Condição: a última mensagem enviada é outra (data-id diferente do de antes do envio)
+        e já tem ✓/✓✓, sem o relógio. A lista é virtualizada: contar balões não serve.
+        """
+        def check(driver):
+            msg_id, bubble = self._last_outgoing(driver)
+            if not msg_id or msg_id == before_id: return False
+            if bubble.find_elements(By.CSS_SELECTOR, PENDING_ICON): return False
+            return bool(bubble.find_elements(By.CSS_SELECTOR, SENT_ICONS))
+        return check
+
+    def _attach_and_send(self, driver, paths, timings):
+        """
+        Um lote de anexo: abre o menu, entrega os arquivos ao input e confirma uma vez.
+        Retorna quantos arquivos foram no lote.
+        """
+        attach_btn = self._find_attach_button(driver)
+        if not attach_btn: raise Exception("Botão Anexar não encontrado")
+        self.force_click(attach_btn, driver)
+        self._wait(driver, 'menu', EC.presence_of_element_located((By.XPATH, '//input[@type="file"]')), timings)
+
+        file_input = self._find_file_input(driver)
+        # O input aceita vários caminhos separados por quebra de linha; sem 'multiple', um só
+        batch = paths if file_input.get_attribute('multiple') else paths[:1]
+        file_input.send_keys("\n".join(batch))
+
+        # Prévia pronta = botão de enviar da tela de mídia clicável
+        try:
+            send_btn = self._wait(driver, 'previa', EC.element_to_be_clickable(SEND_BUTTON), timings)
+            self.force_click(send_btn, driver)
+        except TimeoutException:
+            print("⚠️ WhatsApp: botão enviar não apareceu, tentando Enter")
+            ActionChains(driver).send_keys(Keys.ENTER).perform()
+        return len(batch)
+
+    def _send_files(self, phone, files, progress_callback):
+        timings = {}
+        self.last_timings = timings
+        t_total = t = time.time()
+        try:
+            total_steps = 4 # iniciar, abrir conversa, anexar, finalizar
             
             progress_callback(0, total_steps, "Iniciando Sistema...")
-            os.system("pkill -f chrome")
-            time.sleep(0.5)
-
-            # MODO OCULTO (Headless=True) AGORA ATIVADO
-            driver = self.get_driver(headless=True)
+            # Normalmente já está aberto; só paga a partida se o navegador tiver morrido
+            driver = self.ensure_driver()
+            timings['navegador'] = time.time() - t
             
             phone = "".join(filter(str.isdigit, phone))
             if not phone.startswith("55") and len(phone) > 9: phone = "55" + phone
 
-            link = f"https://web.whatsapp.com/send?phone={phone}"
-            driver.get(link)
-            
-            wait = WebDriverWait(driver, 60)
-
             progress_callback(1, total_steps, "Carregando WhatsApp...")
+            t = time.time()
             try:
-                wait.until(EC.presence_of_element_located((By.TAG_NAME, 'footer')))
+                self.open_chat(driver, phone)
             except:
                 raise Exception("Falha no login ou número inválido.")
+            timings['conversa'] = time.time() - t
 
-            current_step = 1
-            
-            for i, filepath in enumerate(files):
-                if not os.path.exists(filepath): continue
-                
-                progress_callback(current_step, total_steps, f"Enviando foto {i+1}/{len(files)}...")
-                
-                # 1. Botão Anexar (Posição)
-                attach_btn = None
-                
-                # Tenta por nome primeiro
-                xpaths_attach = ['//div[@title="Anexar"]', '//span[@data-icon="plus"]']
-                for xp in xpaths_attach:
-                    try: attach_btn = driver.find_element(By.XPATH, xp); break
-                    except: pass
+            paths = [os.path.abspath(f) for f in files if os.path.exists(f)]
+            if not paths: raise Exception("Nenhum arquivo para enviar")
 
-                # Fallback por Posição (Ignorando Emoji)
-                if not attach_btn:
-                    try:
-                        footer = driver.find_element(By.TAG_NAME, 'footer')
-                        buttons = footer.find_elements(By.CSS_SELECTOR, 'div[role="button"], button')
-                        for btn in buttons:
-                            icon = btn.get_attribute('data-icon') or ""
-                            if 'smiley' in icon or 'emoji' in (btn.get_attribute('title') or "").lower(): continue
-                            attach_btn = btn
-                            break
-                    except: pass
+            progress_callback(2, total_steps, f"Enviando {len(paths)} foto(s)...")
+            before_id, _ = self._last_outgoing(driver)
+            remaining = paths
+            while remaining:
+                remaining = remaining[self._attach_and_send(driver, remaining, timings):]
 
-                if not attach_btn: raise Exception("Botão Anexar não encontrado")
-
-                self.force_click(attach_btn, driver)
-                time.sleep(0.8)
-                
-                # 2. Input File
-                file_input = driver.find_element(By.XPATH, '//input[@type="file"]')
-                file_input.send_keys(filepath)
-                
-                # 3. Enviar
-                progress_callback(current_step, total_steps, "Confirmando envio...")
-                time.sleep(3) # Tempo para preview
-                
-                sent = False
-                start_send = time.time()
-                while time.time() - start_send < 5:
-                    try:
-                        send_btn = driver.find_element(By.XPATH, '//span[@data-icon="send"]')
-                        self.force_click(send_btn, driver)
-                        sent = True
-                        break
-                    except:
-                        # Enter se demorar
-                        if time.time() - start_send > 1.5:
-                            try: 
-                                ActionChains(driver).send_keys(Keys.ENTER).perform()
-                                sent = True
-                                break
-                            except: pass
-                        time.sleep(0.1)
-                
-                time.sleep(2) # Upload
-                current_step += 1
-
-            progress_callback(total_steps, total_steps, "Finalizando...")
-            
-            # DELAY EXTRA NO FINAL PARA GARANTIR A ULTIMA FOTO
-            time.sleep(5) 
+            # Só termina quando o WhatsApp marca as mensagens como enviadas (✓)
+            progress_callback(3, total_steps, "Aguardando confirmação...")
+            try:
+                self._wait(driver, 'confirmacao', self._delivered(before_id), timings)
+            except TimeoutException:
+                raise Exception("WhatsApp não confirmou o envio (conexão lenta?)")
             
             return True, "Enviado!"
 
         except Exception as e:
             print(f"Erro WhatsApp: {e}")
+            # Fecha prévia/menu que tenha ficado aberto, para o próximo envio começar limpo
+            try: ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+            except: pass
             return False, f"Erro: {str(e)}"
         finally:
-            if driver:
-                try: driver.quit()
-                except: pass
+            # O navegador continua aberto para o próximo envio
+            timings['total'] = time.time() - t_total
+            print("⏱️ WhatsApp: " + " | ".join(f"{k} {v:.1f}s" for k, v in timings.items()))